@@ -1,28 +1,80 @@
 from dotenv import load_dotenv
 load_dotenv()
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
+from itertools import chain
 from uuid import uuid4
+from src.cancellation import TurnContext, watch_disconnect
 from src.conversation import Conversation
+from src.snapshots import snapshot_store
+from src.scheduler import BATCH, INTERACTIVE, AdmissionRejected, current_workload, scheduler
 from src.config import config
+from src.serialization import (
+    ARROW_MIMETYPE,
+    NDJSON_MIMETYPE,
+    FastJSONProvider,
+    arrow_stream,
+    compress_response,
+    gzip_stream,
+    ndjson_stream,
+)
 from typing import Dict
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
+app.after_request(compress_response)
 CORS(app)
 
 # todo: Use a database or persistent storage for conversations like Azure CosmosDB
 conversations: Dict[str, Conversation] = {}
 
+def request_workload():
+    return BATCH if request.headers.get('X-Workload-Class', '').lower() == BATCH else INTERACTIVE
+
+def request_identity(flow=None):
+    """
+    Caller identity from the X-User-Id/X-Tenant-Id headers. Callers without a user id share
+    one anonymous per-user limit and are queued fairly by the given flow (e.g. the conversation)
+    or by client address; callers without a tenant id are not per-tenant limited.
+    """
+    user = request.headers.get('X-User-Id') or None
+    tenant = request.headers.get('X-Tenant-Id') or None
+    return user, tenant, flow or request.remote_addr
+
+def admit_request(flow=None):
+    """Admits the request through the turn scheduler based on the caller's identity headers."""
+    user, tenant, flow = request_identity(flow)
+    return scheduler.admit(user, tenant, request_workload(), flow)
+
+@app.errorhandler(AdmissionRejected)
+def handle_admission_rejected(e):
+    response = jsonify({'error': str(e)})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 429
+
 @app.route('/test', methods=['GET'])
 def test_endpoint():
     return jsonify({'message': 'Test endpoint is working!'}), 200
 
+@app.route('/scheduler/stats', methods=['GET'])
+def scheduler_stats():
+    return jsonify(scheduler.stats()), 200
+
+@app.route('/sql/stats', methods=['GET'])
+def sql_stats():
+    from src.sqlutil import single_flight_stats
+    return jsonify(single_flight_stats()), 200
+
 @app.route('/conversation', methods=['POST'])
 def create_conversation():
     conversation_id = str(uuid4())
     conversations[conversation_id] = Conversation(conversation_id)
     conversation = conversations[conversation_id]
+    if not config.use_mcp_tools:
+        # Start building the find_relevant_tables index before the first question needs it
+        from src.schemaindex import schema_index
+        schema_index.current()
     return jsonify({'conversation':conversation.to_dict()}), 200
 
 @app.route('/conversation/<conversation_id>', methods=['GET'])
@@ -47,8 +99,16 @@ def add_message_to_conversation(conversation_id):
         
         print(f"📝 Processing message: '{message}' for conversation {conversation_id}")
         
-        # Add message and process response
-        conversation.add_message(message)
+        # The client may ask for a shorter deadline than the server-wide cap, e.g. its own request timeout
+        deadline = config.turn_deadline_seconds
+        deadline_ms = request.headers.get('X-Turn-Deadline-Ms', type=int)
+        if deadline_ms:
+            deadline = min(deadline, deadline_ms / 1000)
+
+        # Add message and process response, cancelling the turn if the client goes away
+        turn = TurnContext(deadline)
+        with admit_request(conversation_id), watch_disconnect(turn, request.environ):
+            conversation.add_message(message, turn)
         
         # Get the updated conversation
         updated_conversation = conversation.to_dict()
@@ -57,23 +117,95 @@ def add_message_to_conversation(conversation_id):
         
         return jsonify({'message': 'Message added successfully', 'conversation': updated_conversation}), 200
         
+    except AdmissionRejected:
+        raise
     except Exception as e:
         print(f"❌ Error in add_message_to_conversation: {e}")
         import traceback
         print(f"🔍 Traceback: {traceback.format_exc()}")
         return jsonify({'error': f'Internal server error: {str(e)}'}), 500
 
+@app.route('/conversation/<conversation_id>/turn', methods=['DELETE'])
+def cancel_turn(conversation_id):
+    if conversation_id not in conversations:
+        return jsonify({'error': 'Conversation not found'}), 404
+    if not conversations[conversation_id].cancel_turn():
+        return jsonify({'error': 'No message is being processed'}), 404
+    return jsonify({'message': 'Turn cancelled'}), 200
+
+@app.route('/conversation/<conversation_id>/pin', methods=['POST'])
+def pin_last_turn(conversation_id):
+    if conversation_id not in conversations:
+        return jsonify({'error': 'Conversation not found'}), 404
+    ttl_seconds = (request.get_json(silent=True) or {}).get('ttl_seconds')
+    try:
+        with admit_request(conversation_id):
+            snapshot = conversations[conversation_id].pin_last_turn(ttl_seconds)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'snapshot': snapshot}), 200
+
+@app.route('/snapshots', methods=['GET'])
+def list_snapshots():
+    return jsonify({'snapshots': snapshot_store.list()}), 200
+
+@app.route('/snapshots/<snapshot_id>', methods=['DELETE'])
+def delete_snapshot(snapshot_id):
+    if not snapshot_store.remove(snapshot_id):
+        return jsonify({'error': 'Snapshot not found'}), 404
+    return jsonify({'message': 'Snapshot deleted'}), 200
+
 @app.route('/sql/query', methods=['POST'])
 def run_query():
     from src.sqlutil import run_sql_query
     query = request.json.get('query')
     params = request.json.get('params', ())
+
+    # Large result sets can be streamed as NDJSON or Arrow instead of one JSON document
+    mimetype = request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE, ARROW_MIMETYPE])
+    if mimetype in (NDJSON_MIMETYPE, ARROW_MIMETYPE):
+        return stream_query(query, params, mimetype)
     
     try:
-        results = run_sql_query(query, params)
+        with admit_request():
+            results = run_sql_query(query, params)
         return jsonify({'results': results}), 200
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def stream_query(query, params, mimetype):
+    from src.sqlutil import iter_sql_query
+
+    # The admission slot is held until the whole body has been sent, so it is released on close
+    waiter = scheduler.acquire(*request_identity())
+    # Arrow's schema comes from the cursor's column types, not from the values of the first batch
+    description = []
+    batches = iter_sql_query(query, params, config.sql_stream_batch_size, description.extend)
+    # The connection is opened by the first fetch, so that is where the SQL pool partition is chosen
+    token = current_workload.set(request_workload())
+    try:
+        # Fetch the first batch eagerly so query errors still produce a JSON error response
+        first = next(batches, [])
     except Exception as e:
+        scheduler.release(waiter)
         return jsonify({'error': str(e)}), 500
+    finally:
+        current_workload.reset(token)
+
+    if mimetype == ARROW_MIMETYPE:
+        body = arrow_stream(chain([first], batches), description)
+    else:
+        body = ndjson_stream(chain([first], batches))
+    headers = {}
+    if request.accept_encodings['gzip']:
+        body = gzip_stream(body)
+        headers['Content-Encoding'] = 'gzip'
+        headers['Vary'] = 'Accept-Encoding'
+    response = Response(stream_with_context(body), mimetype=mimetype, headers=headers)
+    response.call_on_close(lambda: scheduler.release(waiter))
+    return response
 
 if __name__ == '__main__':
     print("🚀 Starting NL2SQL Chat Backend...")
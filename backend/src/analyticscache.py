@@ -0,0 +1,286 @@
+import datetime
+import threading
+import time
+import uuid
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
+from src.config import config
+from src.serialization import arrow_schema
+
+# Optional dependencies: the cache is simply disabled when they are not installed
+try:
+    import duckdb
+    import pyarrow as pa
+    import sqlglot
+    from sqlglot import exp
+    from sqlglot.optimizer.annotate_types import annotate_types
+    from sqlglot.optimizer.qualify import qualify
+except ImportError:  # pragma: no cover - depends on the deployment
+    duckdb = pa = sqlglot = exp = annotate_types = qualify = None
+
+
+def _split_table_name(table: str) -> Tuple[str, str]:
+    parts = [part.strip("[]\" ") for part in table.split(".")]
+    if len(parts) == 1:
+        return "dbo", parts[0]
+    return parts[-2], parts[-1]
+
+
+def _case_insensitive(node):
+    """SQL Server's default collation makes LIKE case-insensitive; DuckDB's LIKE ignores collations."""
+    if isinstance(node, exp.Like):
+        return exp.ILike(**node.args)
+    return node
+
+
+def _integer_arithmetic(statement, columns: FrozenSet[Tuple[str, str, str, str]]):
+    """
+    Keeps SQL Server's integer arithmetic, which DuckDB does not share: int / int truncates
+    (7 / 2 is 3, DuckDB's / gives 3.5) and AVG of an integer column is an integer.
+    Operand types are inferred from the mirrored tables' column types. Returns the rewritten
+    statement, or None when a division or AVG has an operand whose type cannot be inferred.
+    """
+    targets = list(statement.find_all(exp.Div, exp.Avg))
+    if not targets:
+        return statement
+    schema: Dict[str, Dict[str, Dict[str, str]]] = {}
+    for schema_name, table_name, column_name, data_type in columns:
+        schema.setdefault(schema_name, {}).setdefault(table_name, {})[column_name] = data_type
+    try:
+        annotated = qualify(statement.copy(), schema=schema, dialect="tsql", validate_qualify_columns=False)
+        annotated = annotate_types(annotated, schema=schema, dialect="tsql")
+    except Exception:
+        return None
+    typed = list(annotated.find_all(exp.Div, exp.Avg))
+    # Qualifying never adds or removes operators, so both walks visit them in the same order
+    if [type(node) for node in typed] != [type(node) for node in targets]:
+        return None
+
+    replacements = {}
+    for node, annotated_node in zip(targets, typed):
+        operands = [annotated_node.this] + ([annotated_node.expression] if isinstance(node, exp.Div) else [])
+        types = [operand.type for operand in operands]
+        if any(t is None or t.is_type(exp.DataType.Type.UNKNOWN) for t in types):
+            return None
+        if not all(t.is_type(*exp.DataType.INTEGER_TYPES) for t in types):
+            continue
+        if isinstance(node, exp.Div):
+            replacements[id(node)] = exp.IntDiv(this=node.this.copy(), expression=node.expression.copy())
+        else:
+            replacements[id(node)] = exp.cast(exp.func("TRUNC", node.copy()), "BIGINT")
+    if not replacements:
+        return statement
+    return statement.transform(lambda node: replacements.get(id(node), node), copy=False)
+
+
+@lru_cache(maxsize=1024)
+def _translate(
+    query: str,
+    tables: FrozenSet[Tuple[str, str]],
+    columns: FrozenSet[Tuple[str, str, str, str]] = frozenset(),
+) -> Optional[str]:
+    """
+    Translates a T-SQL query to DuckDB SQL if it is a read-only query over mirrored tables only.
+    String comparisons follow SQL Server's default case-insensitive collation: the local store
+    compares with DuckDB's NOCASE collation, LIKE becomes ILIKE, and queries using string functions
+    whose matching depends on the collation (CHARINDEX, PATINDEX, REPLACE) are not eligible.
+    Integer division and AVG keep SQL Server's integer results, using the (schema, table,
+    column, type) entries in columns; queries whose operand types are unknown are not eligible.
+    Returns:
+        Optional[str]: The translated query, or None if the query is not eligible.
+    """
+    try:
+        statements = sqlglot.parse(query, read="tsql")
+    except Exception:
+        return None
+    if len(statements) != 1 or not isinstance(statements[0], (exp.Select, exp.Union)):
+        return None
+    statement = statements[0]
+    if statement.find(exp.Insert, exp.Update, exp.Delete, exp.Merge, exp.Create, exp.Drop, exp.Into):
+        return None
+    if statement.find(exp.StrPosition, exp.Replace) or any(
+        function.name.upper() == "PATINDEX" for function in statement.find_all(exp.Anonymous)
+    ):
+        return None
+
+    cte_names = {cte.alias_or_name.lower() for cte in statement.find_all(exp.CTE)}
+    for table in statement.find_all(exp.Table):
+        if not table.db and table.name.lower() in cte_names:
+            continue
+        if table.catalog or ((table.db or "dbo").lower(), table.name.lower()) not in tables:
+            return None
+    statement = _integer_arithmetic(statement, columns)
+    if statement is None:
+        return None
+    try:
+        return statement.transform(_case_insensitive).sql(dialect="duckdb")
+    except Exception:
+        return None
+
+
+class AnalyticsCache:
+    """
+    Local DuckDB mirror of a few hot tables, refreshed from Azure SQL in the background.
+
+    Eligible run_sql_query calls (a single read-only SELECT touching only mirrored tables)
+    are translated from T-SQL to DuckDB SQL and answered locally. Everything else, and
+    anything that fails locally, goes to SQL Server as before. If the local store cannot be
+    opened, e.g. because another worker process holds the DuckDB file's write lock, the cache
+    is disabled for this process and every query goes to SQL Server.
+    """
+
+    def __init__(self, tables: Sequence[str], path: str, refresh_seconds: int, batch_size: int):
+        self.tables = [_split_table_name(table) for table in tables]
+        self.path = path
+        self.refresh_seconds = refresh_seconds
+        self.batch_size = batch_size
+        self.loaded_at: Dict[Tuple[str, str], datetime.datetime] = {}
+        # Lower-cased (schema, table) pairs that have a complete local snapshot
+        self._ready: FrozenSet[Tuple[str, str]] = frozenset()
+        # (schema, table, column, DuckDB type) of the loaded tables, for type-dependent translation
+        self._columns: FrozenSet[Tuple[str, str, str, str]] = frozenset()
+        self._conn = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._disabled = False
+
+    @property
+    def available(self) -> bool:
+        return bool(self.tables) and duckdb is not None and not self._disabled
+
+    def start(self):
+        """Opens the local store and starts the background refresh thread (idempotent)."""
+        if not self.available:
+            return
+        with self._lock:
+            if self._thread is not None or self._disabled:
+                return
+            try:
+                # NOCASE matches SQL Server's default case-insensitive collation for =, IN, ORDER BY and GROUP BY
+                self._conn = duckdb.connect(self.path, config={"default_collation": "nocase"})
+                for schema_name, table_name in self.tables:
+                    if self._table_exists(schema_name, table_name):
+                        self._mark_loaded(schema_name, table_name)
+            except Exception as e:
+                print(f"⚠️  Analytics cache disabled in this process, queries go to SQL Server: {e}")
+                self._disabled = True
+                self._conn = None
+                return
+            self._thread = threading.Thread(target=self._refresh_loop, name="analytics-cache-refresh", daemon=True)
+            self._thread.start()
+        print(f"🦆 Analytics cache started for {len(self.tables)} tables at {self.path}")
+
+    def _mark_loaded(self, schema_name: str, table_name: str):
+        key = (schema_name.lower(), table_name.lower())
+        columns = self._conn.cursor().execute(
+            "SELECT column_name, data_type FROM information_schema.columns WHERE table_schema = ? AND table_name = ?",
+            [schema_name, table_name],
+        ).fetchall()
+        self.loaded_at[key] = datetime.datetime.now()
+        self._columns = frozenset(
+            column for column in self._columns if (column[0], column[1]) != key
+        ) | {(key[0], key[1], name.lower(), data_type) for name, data_type in columns}
+        self._ready = self._ready | {key}
+
+    def _table_exists(self, schema_name: str, table_name: str) -> bool:
+        result = self._conn.cursor().execute(
+            "SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = ? AND table_name = ?",
+            [schema_name, table_name],
+        ).fetchone()
+        return bool(result and result[0])
+
+    def _refresh_loop(self):
+        while True:
+            self.refresh()
+            time.sleep(self.refresh_seconds)
+
+    def refresh(self):
+        """Snapshots every mirrored table from SQL Server."""
+        for schema_name, table_name in self.tables:
+            try:
+                self.snapshot_table(schema_name, table_name)
+            except Exception as e:
+                print(f"❌ Error refreshing analytics cache for {schema_name}.{table_name}: {e}")
+
+    def snapshot_table(self, schema_name: str, table_name: str):
+        """Streams one table from SQL Server with fetchmany and swaps it into the local store."""
+        import pyodbc
+
+        started = time.perf_counter()
+        staging = f"{table_name}__staging"
+        local = self._conn.cursor()
+        local.execute(f'CREATE SCHEMA IF NOT EXISTS "{schema_name}"')
+        local.execute(f'DROP TABLE IF EXISTS "{schema_name}"."{staging}"')
+
+        row_count = 0
+        with pyodbc.connect(config.sql_connection_string) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(f"SELECT * FROM [{schema_name.replace(']', ']]')}].[{table_name.replace(']', ']]')}]")
+                description = cursor.description
+                schema = arrow_schema(description)
+                created = False
+                while True:
+                    rows = cursor.fetchmany(self.batch_size)
+                    if not rows and created:
+                        break
+                    columns = {
+                        field.name: [
+                            str(row[i]) if isinstance(row[i], uuid.UUID) else row[i] for row in rows
+                        ]
+                        for i, field in enumerate(schema)
+                    }
+                    local.register("batch", pa.Table.from_pydict(columns, schema=schema))
+                    if created:
+                        local.execute(f'INSERT INTO "{schema_name}"."{staging}" SELECT * FROM batch')
+                    else:
+                        local.execute(f'CREATE TABLE "{schema_name}"."{staging}" AS SELECT * FROM batch')
+                        created = True
+                    local.unregister("batch")
+                    row_count += len(rows)
+                    if not rows:
+                        break
+
+        local.execute("BEGIN TRANSACTION")
+        try:
+            local.execute(f'DROP TABLE IF EXISTS "{schema_name}"."{table_name}"')
+            local.execute(f'ALTER TABLE "{schema_name}"."{staging}" RENAME TO "{table_name}"')
+            local.execute("COMMIT")
+        except Exception:
+            # Keep the previous snapshot and leave the connection usable for the next refresh
+            local.execute("ROLLBACK")
+            raise
+        self._mark_loaded(schema_name, table_name)
+        print(
+            f"🦆 Snapshotted {schema_name}.{table_name}: {row_count} rows in {time.perf_counter() - started:.1f}s"
+        )
+
+    def try_run(self, query: str, params: Sequence[Any] = ()) -> Optional[List[Dict[str, Any]]]:
+        """
+        Runs the query locally if it is eligible.
+        Returns:
+            Optional[List[Dict[str, Any]]]: The results, or None if the query must go to SQL Server.
+        """
+        if not self.available:
+            return None
+        self.start()
+        if self._disabled:
+            return None
+        translated = _translate(query, self._ready, self._columns)
+        if translated is None:
+            return None
+        try:
+            cursor = self._conn.cursor()
+            cursor.execute(translated, list(params or ()))
+            columns = [column[0] for column in cursor.description] if cursor.description else []
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        except Exception as e:
+            print(f"⚠️  Analytics cache could not run query locally, falling back to SQL Server: {e}")
+            return None
+
+
+analytics_cache = AnalyticsCache(
+    config.analytics_cache_tables,
+    config.analytics_cache_path,
+    config.analytics_cache_refresh_seconds,
+    config.analytics_cache_batch_size,
+)
@@ -0,0 +1,100 @@
+import re
+from typing import Any, Dict, List, Optional
+from src.config import config
+
+# Words that suggest the user wants analysis rather than a lookup
+ANALYTICAL_HINTS = (
+    "compare", "comparison", "versus", " vs", "trend", "over time", "growth", "why",
+    "explain", "correlat", "forecast", "predict", "breakdown", "analy", "insight",
+    "recommend", "difference", "change",
+)
+# Queries the model runs to explore the schema or peek at data rather than to answer: schema
+# lookups, SELECT * probes, SELECT DISTINCT value listings and TOP n samples without ORDER BY
+EXPLORATORY_QUERY_PATTERN = re.compile(
+    r"\bINFORMATION_SCHEMA\b|\bsys\.\w+|^\s*SELECT\s+(TOP\s*\(?\s*\d+\s*\)?\s+)?\*"
+    r"|^\s*SELECT\s+DISTINCT\b"
+    r"|^\s*SELECT\s+TOP\b(?![\s\S]*\bORDER\s+BY\b)",
+    re.IGNORECASE,
+)
+SIMPLE = "simple"
+MODERATE = "moderate"
+COMPLEX = "complex"
+
+
+def question_complexity(question: str) -> str:
+    """Classifies a question as simple, moderate or complex from its length and wording."""
+    text = f" {(question or '').lower()} "
+    words = len(text.split())
+    hints = sum(1 for hint in ANALYTICAL_HINTS if hint in text)
+    clauses = len(re.findall(r"\b(and|then|also)\b|,", text))
+    if hints >= 2 or words > 30 or clauses >= 3:
+        return COMPLEX
+    if hints == 0 and words <= 15 and clauses <= 1:
+        return SIMPLE
+    return MODERATE
+
+
+def max_iterations_for(question: str) -> int:
+    """
+    Tool-calling iteration cap adapted to the question, bounded by MAX_TOOL_ITERATIONS.
+    Even simple questions get four rounds for the tables -> columns -> query -> answer flow
+    the system prompt asks for.
+    """
+    complexity = question_complexity(question)
+    if complexity == SIMPLE:
+        return min(4, config.max_tool_iterations)
+    if complexity == MODERATE:
+        return min(5, config.max_tool_iterations)
+    return config.max_tool_iterations
+
+
+def is_small_result(rows: Any) -> bool:
+    """True for a single scalar or a small table that can be shown to the user as-is."""
+    if not isinstance(rows, list) or not rows or not all(isinstance(row, dict) for row in rows):
+        return False
+    if "error" in rows[0]:
+        return False
+    return len(rows) <= config.early_exit_max_rows and len(rows[0]) <= config.early_exit_max_columns
+
+
+def render_rows(rows: List[Dict[str, Any]], max_rows: int = 20) -> str:
+    """
+    Renders query results as a short plain-text answer without calling the model.
+    Args:
+        rows (List[Dict[str, Any]]): Query results as returned by run_sql_query.
+        max_rows (int): Maximum number of rows to include.
+    Returns:
+        str: The rendered answer.
+    """
+    if not rows:
+        return "The query returned no results."
+    columns = list(rows[0].keys())
+    if len(rows) == 1 and len(columns) == 1:
+        return f"{columns[0]}: {rows[0][columns[0]]}"
+    lines = [" | ".join(str(column) for column in columns)]
+    for row in rows[:max_rows]:
+        lines.append(" | ".join(str(row.get(column)) for column in columns))
+    if len(rows) > max_rows:
+        lines.append(f"... and {len(rows) - max_rows} more rows")
+    return "\n".join(lines)
+
+
+def is_exploratory_query(query: Optional[str]) -> bool:
+    """True for schema lookups and data probes (see EXPLORATORY_QUERY_PATTERN), whose results are not answers."""
+    return not query or bool(EXPLORATORY_QUERY_PATTERN.search(query))
+
+
+def direct_answer(question: str, tool_name: str, args: Dict[str, Any], rows: Any) -> Optional[str]:
+    """
+    Returns a locally rendered answer when a simple question was answered by one small SQL result.
+    Schema lookups and data probes never count as answers.
+    Returns:
+        Optional[str]: The answer, or None if the model should phrase the answer instead.
+    """
+    if not config.early_exit_enabled or tool_name not in ("run_sql_query", "aggregate"):
+        return None
+    if tool_name == "run_sql_query" and is_exploratory_query((args or {}).get("query")):
+        return None
+    if question_complexity(question) != SIMPLE or not is_small_result(rows):
+        return None
+    return render_rows(rows)
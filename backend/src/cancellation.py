@@ -0,0 +1,131 @@
+import contextvars
+import select
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Optional
+
+
+class TurnCancelled(Exception):
+    """Raised inside a turn once it has been cancelled or has run past its deadline."""
+
+
+class TurnContext:
+    """
+    Cancellation token and deadline for one Conversation.add_message turn.
+
+    Work done on behalf of the turn checks it between steps and registers in-flight
+    resources (pyodbc cursors, model response streams) with track(), so that cancel()
+    can abort them right away instead of waiting for them to finish.
+    """
+
+    def __init__(self, deadline_seconds: Optional[float] = None):
+        self.deadline = time.monotonic() + deadline_seconds if deadline_seconds else None
+        self.reason: Optional[str] = None
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._resources = set()
+        self._timer: Optional[threading.Timer] = None
+        if deadline_seconds:
+            self._timer = threading.Timer(deadline_seconds, self.cancel, args=("deadline exceeded",))
+            self._timer.daemon = True
+            self._timer.start()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline, or None if the turn has no deadline."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def cancel(self, reason: str = "cancelled by client"):
+        """Cancels the turn and aborts every in-flight resource registered with track()."""
+        with self._lock:
+            if self._cancelled.is_set():
+                return
+            self.reason = reason
+            self._cancelled.set()
+            resources = list(self._resources)
+        print(f"⏹️  Cancelling turn: {reason}")
+        for resource in resources:
+            _abort(resource)
+
+    def check(self):
+        """Raises TurnCancelled if the turn was cancelled."""
+        if self._cancelled.is_set():
+            raise TurnCancelled(self.reason)
+
+    @contextmanager
+    def track(self, resource: Any):
+        """Registers a cursor or stream for the duration of the block so cancel() can abort it."""
+        with self._lock:
+            if self._cancelled.is_set():
+                _abort(resource)
+                raise TurnCancelled(self.reason)
+            self._resources.add(resource)
+        try:
+            yield resource
+        finally:
+            with self._lock:
+                self._resources.discard(resource)
+
+    def close(self):
+        """Releases the deadline timer once the turn has finished."""
+        if self._timer is not None:
+            self._timer.cancel()
+
+
+def _abort(resource: Any):
+    try:
+        # pyodbc cursors are cancelled, model response streams are closed
+        if hasattr(resource, "cancel"):
+            resource.cancel()
+        else:
+            resource.close()
+    except Exception as e:
+        print(f"⚠️  Error aborting {type(resource).__name__}: {e}")
+
+
+# The turn being processed by the current thread, read by sqlutil to register cursors
+current_turn: contextvars.ContextVar[Optional[TurnContext]] = contextvars.ContextVar("current_turn", default=None)
+
+
+def client_disconnected(environ: dict) -> bool:
+    """
+    Best-effort check whether the HTTP client has closed its connection.
+    Works with the werkzeug development server and gunicorn, which expose the client socket.
+    """
+    sock = environ.get("gunicorn.socket") or environ.get("werkzeug.socket")
+    if sock is None:
+        return False
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+        if not readable:
+            return False
+        return sock.recv(1, socket.MSG_PEEK) == b""
+    except (OSError, ValueError):
+        # TLS sockets do not support MSG_PEEK; treat the client as still connected
+        return False
+
+
+@contextmanager
+def watch_disconnect(turn: TurnContext, environ: dict, poll_interval: float = 0.5):
+    """Cancels the turn if the client disconnects while the block is running."""
+    done = threading.Event()
+
+    def watch():
+        while not done.wait(poll_interval):
+            if client_disconnected(environ):
+                turn.cancel("client disconnected")
+                return
+
+    watcher = threading.Thread(target=watch, name="disconnect-watch", daemon=True)
+    watcher.start()
+    try:
+        yield turn
+    finally:
+        done.set()
@@ -1,14 +1,20 @@
 import os
-from typing import Optional
+from typing import Dict, List, Optional
 
 class Config:
-    """Configuration class that validates and provides access to environment variables."""
+    """Configuration class that validates and provides access to environment variables.
+
+    Validation is deferred until a required value is first read, so importing the
+    module stays cheap and does not depend on the environment being loaded yet.
+    """
     
     def __init__(self):
-        self.validate_environment()
+        self._validated = False
     
     def validate_environment(self):
         """Validates that all required environment variables are present."""
+        if self._validated:
+            return
         required_vars = [
             'AZURE_OPENAI_ENDPOINT',
             'AZURE_OPENAI_API_KEY',
@@ -26,27 +32,276 @@ class Config:
                 f"Missing required environment variables: {', '.join(missing_vars)}\n"
                 f"Please check your .env file and ensure all required variables are set."
             )
+        self._validated = True
     
     @property
     def azure_openai_endpoint(self) -> str:
+        self.validate_environment()
         return os.getenv('AZURE_OPENAI_ENDPOINT')
     
     @property
     def azure_openai_api_key(self) -> str:
+        self.validate_environment()
         return os.getenv('AZURE_OPENAI_API_KEY')
     
     @property
     def azure_openai_deployment_name(self) -> str:
+        self.validate_environment()
         return os.getenv('AZURE_OPENAI_DEPLOYMENT_NAME')
     
     @property
     def azure_openai_api_version(self) -> str:
         return os.getenv('AZURE_OPENAI_API_VERSION', 'preview')
     
+    @property
+    def openai_http2(self) -> bool:
+        """Multiplex concurrent model calls over HTTP/2 connections (requires the h2 package)."""
+        return os.getenv('OPENAI_HTTP2', 'true').lower() in ('1', 'true', 'yes')
+    
+    @property
+    def openai_max_connections(self) -> int:
+        return int(os.getenv('OPENAI_MAX_CONNECTIONS', '20'))
+    
+    @property
+    def openai_max_keepalive_connections(self) -> int:
+        return int(os.getenv('OPENAI_MAX_KEEPALIVE_CONNECTIONS', '10'))
+    
+    @property
+    def openai_keepalive_expiry(self) -> float:
+        return float(os.getenv('OPENAI_KEEPALIVE_EXPIRY', '120'))
+    
+    @property
+    def openai_connect_timeout(self) -> float:
+        return float(os.getenv('OPENAI_CONNECT_TIMEOUT', '5'))
+    
+    @property
+    def openai_request_timeout(self) -> float:
+        """Per-call timeout in seconds for a single Responses API call."""
+        return float(os.getenv('OPENAI_REQUEST_TIMEOUT', '60'))
+    
+    @property
+    def openai_max_retries(self) -> int:
+        return int(os.getenv('OPENAI_MAX_RETRIES', '2'))
+    
+    @property
+    def use_mcp_tools(self) -> bool:
+        """Let the model call the MCP server directly instead of the backend's function tools."""
+        return os.getenv('USE_MCP_TOOLS', 'true').lower() in ('1', 'true', 'yes')
+    
+    @property
+    def max_tool_iterations(self) -> int:
+        """Upper bound on tool-calling round trips per turn; simpler questions get fewer."""
+        return int(os.getenv('MAX_TOOL_ITERATIONS', '5'))
+    
+    @property
+    def followup_max_output_tokens(self) -> int:
+        return int(os.getenv('FOLLOWUP_MAX_OUTPUT_TOKENS', '800'))
+    
+    @property
+    def early_exit_enabled(self) -> bool:
+        """Answer simple questions straight from a small SQL result without a follow-up model call."""
+        return os.getenv('EARLY_EXIT_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    
+    @property
+    def early_exit_max_rows(self) -> int:
+        return int(os.getenv('EARLY_EXIT_MAX_ROWS', '10'))
+    
+    @property
+    def early_exit_max_columns(self) -> int:
+        return int(os.getenv('EARLY_EXIT_MAX_COLUMNS', '4'))
+    
+    @property
+    def turn_deadline_seconds(self) -> float:
+        """Upper bound on how long one conversation turn may run before it is cancelled."""
+        return float(os.getenv('TURN_DEADLINE_SECONDS', '120'))
+    
+    @property
+    def scheduler_max_concurrent_turns(self) -> int:
+        """Turns processed at once by this worker process; further turns queue."""
+        return int(os.getenv('SCHEDULER_MAX_CONCURRENT_TURNS', '16'))
+    
+    @property
+    def scheduler_max_concurrent_per_user(self) -> int:
+        return int(os.getenv('SCHEDULER_MAX_CONCURRENT_PER_USER', '2'))
+    
+    @property
+    def scheduler_max_concurrent_per_tenant(self) -> int:
+        return int(os.getenv('SCHEDULER_MAX_CONCURRENT_PER_TENANT', '8'))
+    
+    @property
+    def scheduler_max_queue(self) -> int:
+        """Queued turns beyond this are rejected with 429."""
+        return int(os.getenv('SCHEDULER_MAX_QUEUE', '64'))
+    
+    @property
+    def scheduler_max_wait_seconds(self) -> float:
+        return float(os.getenv('SCHEDULER_MAX_WAIT_SECONDS', '30'))
+    
+    @property
+    def scheduler_tenant_weights(self) -> Dict[str, float]:
+        """Fair-queuing weights per tenant, e.g. 'sales=2,finance=1'. Unlisted tenants weigh 1."""
+        weights = {}
+        for item in os.getenv('SCHEDULER_TENANT_WEIGHTS', '').split(','):
+            if '=' in item:
+                tenant, weight = item.split('=', 1)
+                weights[tenant.strip()] = float(weight)
+        return weights
+    
+    @property
+    def sql_interactive_pool_size(self) -> int:
+        """Concurrent SQL connections available to interactive work."""
+        return int(os.getenv('SQL_INTERACTIVE_POOL_SIZE', '16'))
+    
+    @property
+    def sql_batch_pool_size(self) -> int:
+        """Concurrent SQL connections available to batch work."""
+        return int(os.getenv('SQL_BATCH_POOL_SIZE', '4'))
+    
+    @property
+    def sql_single_flight_enabled(self) -> bool:
+        """Share one database call between concurrent identical read-only queries."""
+        return os.getenv('SQL_SINGLE_FLIGHT_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    
+    @property
+    def llm_stub_enabled(self) -> bool:
+        """Answer model calls with canned responses instead of Azure OpenAI (load tests only)."""
+        return os.getenv('LLM_STUB_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    
+    @property
+    def llm_stub_latency_seconds(self) -> float:
+        return float(os.getenv('LLM_STUB_LATENCY_SECONDS', '0.8'))
+    
+    @property
+    def sql_standin_path(self) -> Optional[str]:
+        """SQLite database used instead of Azure SQL (load tests only)."""
+        return os.getenv('SQL_STANDIN_PATH')
+    
+    @property
+    def recording_mode(self) -> str:
+        """'record' captures model and SQL calls to RECORDING_PATH, 'replay' serves them back."""
+        return os.getenv('RECORDING_MODE', 'off').lower()
+    
+    @property
+    def recording_path(self) -> str:
+        return os.getenv('RECORDING_PATH', 'recording.jsonl.gz')
+    
+    @property
+    def replay_latency_scale(self) -> float:
+        """Multiplier for recorded latencies during replay; 0 replays without waiting."""
+        return float(os.getenv('REPLAY_LATENCY_SCALE', '1.0'))
+    
+    @property
+    def azure_sql_server(self) -> Optional[str]:
+        return os.getenv('AZURE_SQL_SERVER')
+    
+    @property
+    def azure_sql_database(self) -> Optional[str]:
+        return os.getenv('AZURE_SQL_DATABASE')
+    
+    @property
+    def azure_sql_username(self) -> Optional[str]:
+        return os.getenv('AZURE_SQL_USERNAME')
+    
+    @property
+    def azure_sql_password(self) -> Optional[str]:
+        return os.getenv('AZURE_SQL_PASSWORD')
+    
+    @property
+    def sql_connection_string(self) -> str:
+        """Builds the SQL Server connection string from individual components."""
+        return (
+            f"Driver={{ODBC Driver 17 for SQL Server}};"
+            f"Server={self.azure_sql_server};"
+            f"Database={self.azure_sql_database};"
+            f"Uid={self.azure_sql_username};"
+            f"Pwd={self.azure_sql_password};"
+            f"Encrypt=yes;"
+            f"TrustServerCertificate=no;"
+            f"Connection Timeout=30;"
+        )
+    
+    @property
+    def plan_cache_enabled(self) -> bool:
+        return os.getenv('PLAN_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    
+    @property
+    def plan_cache_path(self) -> Optional[str]:
+        """Optional JSON file used to persist the plan cache across restarts."""
+        return os.getenv('PLAN_CACHE_PATH')
+    
+    @property
+    def plan_cache_llm_phrasing(self) -> bool:
+        """When true, cached plans still use one model call to phrase the final answer."""
+        return os.getenv('PLAN_CACHE_LLM_PHRASING', 'false').lower() in ('1', 'true', 'yes')
+
+    @property
+    def snapshots_enabled(self) -> bool:
+        return os.getenv('SNAPSHOTS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
 
+    @property
+    def snapshot_path(self) -> Optional[str]:
+        """JSON file used to persist pinned queries and their latest results across restarts."""
+        return os.getenv('SNAPSHOT_PATH', 'snapshots.json')
+
+    @property
+    def snapshot_default_ttl_seconds(self) -> int:
+        return int(os.getenv('SNAPSHOT_DEFAULT_TTL_SECONDS', '3600'))
+
+    @property
+    def snapshot_max_rows(self) -> int:
+        """Pinned queries returning more rows than this are not materialized."""
+        return int(os.getenv('SNAPSHOT_MAX_ROWS', '5000'))
+
+    @property
+    def response_compression_min_bytes(self) -> int:
+        """Responses smaller than this are sent uncompressed."""
+        return int(os.getenv('RESPONSE_COMPRESSION_MIN_BYTES', '1024'))
+    
+    @property
+    def response_compression_level(self) -> int:
+        return int(os.getenv('RESPONSE_COMPRESSION_LEVEL', '5'))
+    
+    @property
+    def sql_stream_batch_size(self) -> int:
+        """Rows fetched per batch when /sql/query streams NDJSON or Arrow."""
+        return int(os.getenv('SQL_STREAM_BATCH_SIZE', '1000'))
+    
+    @property
+    def schema_index_ttl_seconds(self) -> int:
+        """How long the find_relevant_tables index is used before it is rebuilt."""
+        return int(os.getenv('SCHEMA_INDEX_TTL_SECONDS', '3600'))
+    
+    @property
+    def schema_index_sample_values(self) -> int:
+        """Rows sampled per table to index text values; 0 disables sampling."""
+        return int(os.getenv('SCHEMA_INDEX_SAMPLE_VALUES', '3'))
+    
+    @property
+    def schema_index_embedding_model(self) -> Optional[str]:
+        """Optional local sentence-transformers model blended with BM25, e.g. all-MiniLM-L6-v2."""
+        return os.getenv('SCHEMA_INDEX_EMBEDDING_MODEL')
+    
+    @property
+    def analytics_cache_tables(self) -> List[str]:
+        """Tables mirrored into the local analytics cache, e.g. 'Sales.Orders,Sales.Customers'."""
+        tables = os.getenv('ANALYTICS_CACHE_TABLES', '')
+        return [table.strip() for table in tables.split(',') if table.strip()]
+    
+    @property
+    def analytics_cache_path(self) -> str:
+        return os.getenv('ANALYTICS_CACHE_PATH', 'analytics_cache.duckdb')
+    
+    @property
+    def analytics_cache_refresh_seconds(self) -> int:
+        return int(os.getenv('ANALYTICS_CACHE_REFRESH_SECONDS', '86400'))
+    
+    @property
+    def analytics_cache_batch_size(self) -> int:
+        return int(os.getenv('ANALYTICS_CACHE_BATCH_SIZE', '10000'))
     
     def log_config_status(self):
         """Logs the configuration status (without sensitive data)."""
+        self.validate_environment()
         print("✅ Environment configuration loaded successfully:")
         print(f"   Azure OpenAI Endpoint: {self.azure_openai_endpoint}")
         print(f"   Azure OpenAI Deployment: {self.azure_openai_deployment_name}")
@@ -1,6 +1,22 @@
-from openai import AzureOpenAI
-# from src.sqlutil import run_sql_query, get_db_tables, get_db_columns_and_types
+from src.sqlutil import (
+    run_sql_query,
+    get_db_tables,
+    get_db_columns_and_types,
+    describe_table_stats,
+    aggregate,
+    sample_rows,
+    AGGREGATE_FUNCTIONS,
+    FILTER_OPERATORS,
+)
 from src.config import config
+from src.llmclient import get_oai_client
+from src.cancellation import TurnCancelled, TurnContext, current_turn
+from src.plancache import plan_cache, is_sql_error
+from src.answers import direct_answer, max_iterations_for, render_rows
+from src.schemaindex import find_relevant_tables
+from src.recording import recorder
+from src.loadstub import stub_response
+from src.snapshots import snapshot_store
 import json
 
 SYSTEM_MESSAGE = {
@@ -8,26 +24,24 @@ SYSTEM_MESSAGE = {
     "content": """You are a helpful assistant.
 You help users who are in our sales department with their questions. You have access to a SQL database that contains information about our products, customers, and sales.
 You can execute multiple queries in order to generate an answer.
-Always check the table names and column names before executing a query.
+Always check the table names and column names before executing a query. Use find_relevant_tables to find the tables related to a question instead of listing every table.
 You can answer questions about our products, customers, and sales.
+When you need totals, counts or distributions, use the aggregate and describe_table_stats tools instead of selecting raw rows.
 """,
 }
 
-# Initialize Azure OpenAI client for Responses API
-oai_client = AzureOpenAI(
-    base_url=f"{config.azure_openai_endpoint.rstrip('/')}/openai/v1/",
-    api_key=config.azure_openai_api_key,
-    api_version="preview",  # Use "preview" for the new v1 Responses API
-)
-
 
 class Conversation:
     def __init__(self, conversation_id):
         self.conversation_id = conversation_id
         self.messages = [SYSTEM_MESSAGE]
+        # run_sql_query calls made while answering the most recent user message
+        self.last_turn_queries = []
+        # TurnContext of the message currently being processed, if any
+        self.active_turn = None
         self.tools = [
             {
-                "executor": lambda x: "run_sql_query",
+                "executor": run_sql_query,
                 "definition": {
                     "type": "function",
                     "name": "run_sql_query",
@@ -52,7 +66,7 @@ class Conversation:
                 },
             },
             {
-                "executor": lambda x: "get_db_tables",
+                "executor": get_db_tables,
                 "definition": {
                     "type": "function",
                     "name": "get_db_tables",
@@ -67,7 +81,31 @@ class Conversation:
                 },
             },
             {
-                "executor": lambda x:"get_db_columns_and_types",
+                "executor": find_relevant_tables,
+                "definition": {
+                    "type": "function",
+                    "name": "find_relevant_tables",
+                    "description": "Searches table names, column names, descriptions and sample values and returns the tables most relevant to a question, with their key columns.",
+                    "strict": True,
+                    "parameters": {
+                        "type": "object",
+                        "properties": {
+                            "question": {
+                                "type": "string",
+                                "description": "The user's question or the concepts to look for.",
+                            },
+                            "k": {
+                                "type": "integer",
+                                "description": "Maximum number of tables to return (at most 20).",
+                            },
+                        },
+                        "required": ["question", "k"],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            {
+                "executor": get_db_columns_and_types,
                 "definition": {
                     "type": "function",
                     "name": "get_db_columns_and_types",
@@ -90,6 +128,132 @@ class Conversation:
                     },
                 },
             },
+            {
+                "executor": describe_table_stats,
+                "definition": {
+                    "type": "function",
+                    "name": "describe_table_stats",
+                    "description": "Returns the row count and per-column non-null count, approximate distinct count and min/max for a table, computed on the server. Prefer this over selecting raw rows to understand a table.",
+                    "strict": True,
+                    "parameters": {
+                        "type": "object",
+                        "properties": {
+                            "schema_name": {
+                                "type": "string",
+                                "description": "The schema name of the table.",
+                            },
+                            "table_name": {
+                                "type": "string",
+                                "description": "The table name.",
+                            },
+                            "sample_percent": {
+                                "type": ["number", "null"],
+                                "description": "Optional percentage of the table to sample for very large tables.",
+                            },
+                        },
+                        "required": ["schema_name", "table_name", "sample_percent"],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            {
+                "executor": aggregate,
+                "definition": {
+                    "type": "function",
+                    "name": "aggregate",
+                    "description": "Computes totals, counts, averages or distributions on the server with GROUP BY and returns only the summary rows. Use this instead of selecting raw rows when you need aggregates.",
+                    "strict": True,
+                    "parameters": {
+                        "type": "object",
+                        "properties": {
+                            "schema_name": {
+                                "type": "string",
+                                "description": "The schema name of the table.",
+                            },
+                            "table_name": {
+                                "type": "string",
+                                "description": "The table name.",
+                            },
+                            "measures": {
+                                "type": "array",
+                                "description": "Aggregates to compute. Use column '*' with COUNT to count rows.",
+                                "items": {
+                                    "type": "object",
+                                    "properties": {
+                                        "function": {
+                                            "type": "string",
+                                            "enum": list(AGGREGATE_FUNCTIONS),
+                                        },
+                                        "column": {"type": "string"},
+                                    },
+                                    "required": ["function", "column"],
+                                    "additionalProperties": False,
+                                },
+                            },
+                            "group_by": {
+                                "type": "array",
+                                "items": {"type": "string"},
+                                "description": "Columns to group by.",
+                            },
+                            "filters": {
+                                "type": "array",
+                                "description": "Conditions combined with AND.",
+                                "items": {
+                                    "type": "object",
+                                    "properties": {
+                                        "column": {"type": "string"},
+                                        "operator": {
+                                            "type": "string",
+                                            "enum": sorted(FILTER_OPERATORS),
+                                        },
+                                        "value": {"type": ["string", "null"]},
+                                    },
+                                    "required": ["column", "operator", "value"],
+                                    "additionalProperties": False,
+                                },
+                            },
+                            "limit": {
+                                "type": "integer",
+                                "description": "Maximum number of groups to return (at most 100).",
+                            },
+                        },
+                        "required": ["schema_name", "table_name", "measures", "group_by", "filters", "limit"],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            {
+                "executor": sample_rows,
+                "definition": {
+                    "type": "function",
+                    "name": "sample_rows",
+                    "description": "Returns a small sample of rows from a table to see what the data looks like.",
+                    "strict": True,
+                    "parameters": {
+                        "type": "object",
+                        "properties": {
+                            "schema_name": {
+                                "type": "string",
+                                "description": "The schema name of the table.",
+                            },
+                            "table_name": {
+                                "type": "string",
+                                "description": "The table name.",
+                            },
+                            "n": {
+                                "type": "integer",
+                                "description": "Number of rows to return (at most 100).",
+                            },
+                            "sample_percent": {
+                                "type": ["number", "null"],
+                                "description": "Optional percentage of the table to sample from instead of the first rows.",
+                            },
+                        },
+                        "required": ["schema_name", "table_name", "n", "sample_percent"],
+                        "additionalProperties": False,
+                    },
+                },
+            },
         ]
         self.mcp_tools = [
             {
@@ -127,50 +291,258 @@ class Conversation:
             "messages": self.get_messages(),
         }
 
+    def call_function(self, name, args):
+        """Runs a tool and returns its raw result."""
+        for tool in self.tools:
+            if tool["definition"]["name"] == name:
+                fn = tool["executor"]
+                return fn(**args)
+        raise ValueError(f"Function {name} not found")
+
     def execute_function(self, name, args):
         try:
-            for tool in self.tools:
-                if tool["definition"]["name"] == name:
-                    fn = tool["executor"]
-                    results = fn(**args)
-                    return str(results)
-            raise ValueError(f"Function {name} not found")
+            return str(self.call_function(name, args))
+        except TurnCancelled:
+            raise
         except Exception as e:
             error_msg = f"Error executing function {name}: {str(e)}"
             print(f"❌ {error_msg}")
             return error_msg
 
-    def add_message(self, message):
+    def collect_sql_calls(self, output_items):
+        """Collects run_sql_query calls executed remotely by the MCP server."""
+        for item in output_items:
+            if getattr(item, "type", None) != "mcp_call" or getattr(item, "name", None) != "run_sql_query":
+                continue
+            try:
+                args = json.loads(getattr(item, "arguments", None) or "{}")
+            except json.JSONDecodeError:
+                continue
+            self.last_turn_queries.append(
+                {
+                    "query": args.get("query"),
+                    "params": args.get("params") or [],
+                    "ok": not getattr(item, "error", None) and not is_sql_error(getattr(item, "output", "")),
+                }
+            )
+
+    def create_response(self, turn, **kwargs):
+        """Calls the Responses API (or replays a recorded call) and returns the final response."""
+        turn.check()
+        if config.llm_stub_enabled:
+            response = stub_response(kwargs)
+        else:
+            response = recorder.llm_call(lambda: self.stream_response(turn, **kwargs), kwargs)
+        turn.check()
+        return response
+
+    def stream_response(self, turn, **kwargs):
+        """
+        Calls the Responses API in streaming mode so that cancelling the turn aborts the call,
+        and returns the final response. The call timeout is capped by the turn's deadline.
+        """
+        timeout = config.openai_request_timeout
+        if turn.remaining() is not None:
+            timeout = min(timeout, turn.remaining())
+        stream = get_oai_client().responses.create(stream=True, timeout=timeout, **kwargs)
+        final_response = None
+        try:
+            with turn.track(stream):
+                for event in stream:
+                    if event.type in ("response.completed", "response.incomplete", "response.failed"):
+                        final_response = event.response
+                    elif event.type == "error":
+                        raise RuntimeError(f"Responses API stream error: {getattr(event, 'message', event)}")
+        except TurnCancelled:
+            raise
+        except Exception:
+            # Closing the stream from another thread surfaces here as a transport error
+            if turn.cancelled:
+                raise TurnCancelled(turn.reason)
+            raise
+        turn.check()
+        if final_response is None:
+            raise RuntimeError("Responses API stream ended without a final response")
+        return final_response
+
+    def cancel_turn(self, reason="cancelled by client"):
+        """Cancels the message currently being processed. Returns False if there is none."""
+        turn = self.active_turn
+        if turn is None:
+            return False
+        turn.cancel(reason)
+        return True
+
+    def is_first_question(self):
+        """
+        True while the conversation's only user message is the one being answered.
+        The plan cache is keyed on the question alone, so follow-ups ("and for last year?")
+        that depend on earlier turns must neither be learned nor served from it.
+        """
+        return sum(1 for message in self.get_messages() if message.get("role") == "user") == 1
+
+    def answer_from_plan_cache(self, message, turn):
+        """
+        Answers a message from a cached SQL template, skipping the tool-calling round trips.
+        Returns:
+            Optional[str]: The answer, or None if no template matched or the query failed.
+        """
+        if not self.is_first_question():
+            return None
+        plan = plan_cache.lookup(message)
+        if plan is None:
+            return None
+        query, params = plan
+        print(f"⚡ Plan cache hit, running cached template with params {params}")
+        rows = run_sql_query(query, params)
+        if is_sql_error(rows):
+            print(f"⚠️  Cached template failed, falling back to the model")
+            return None
+        if not rows:
+            # An empty result may mean the question bound a value the template was not meant for
+            print(f"⚠️  Cached template returned no rows, falling back to the model")
+            return None
+        self.last_turn_queries.append({"query": query, "params": list(params), "ok": True})
+
+        if not config.plan_cache_llm_phrasing:
+            return render_rows(rows)
+        response = self.create_response(
+            turn,
+            input=self.get_messages()
+            + [
+                {
+                    "role": "developer",
+                    "content": f"The following SQL query was executed to answer the last question:\n{query}\n"
+                    f"Parameters: {list(params)}\nResults: {rows}\nAnswer the question using these results.",
+                }
+            ],
+            model=config.azure_openai_deployment_name,
+            temperature=0.7,
+            max_output_tokens=config.followup_max_output_tokens,
+        )
+        return response.output_text or render_rows(rows)
+
+    def answer_from_snapshot(self, message):
+        """
+        Answers a message from a pinned snapshot without calling the model or the database.
+        Returns:
+            Optional[str]: The answer with its freshness, or None if no snapshot is pinned for it.
+        """
+        snapshot = snapshot_store.lookup(message)
+        if snapshot is None:
+            return None
+        print(f"📌 Snapshot hit for '{snapshot['question']}'")
+        refreshed_at = snapshot_store.describe(snapshot)["refreshed_at"]
+        return f"{render_rows(snapshot['result'])}\n\n(Data as of {refreshed_at})"
+
+    def pin_last_turn(self, ttl_seconds=None):
+        """
+        Pins the most recent user message to the last successful run_sql_query call that answered it.
+        Raises:
+            ValueError: If the last turn has no successful SQL query to pin.
+        """
+        questions = [message for message in self.get_messages() if message.get("role") == "user"]
+        queries = [call for call in self.last_turn_queries if call["ok"] and call["query"]]
+        if not questions or not queries:
+            raise ValueError("The last message was not answered by a SQL query")
+        call = queries[-1]
+        return snapshot_store.pin(
+            questions[-1]["content"],
+            call["query"],
+            call["params"],
+            ttl_seconds or config.snapshot_default_ttl_seconds,
+        )
+
+    def remember_plan(self, message):
+        """Stores the turn's SQL as a template when a single successful query answered the first question."""
+        if len(self.last_turn_queries) != 1 or not self.is_first_question():
+            return
+        call = self.last_turn_queries[0]
+        if call["ok"] and call["query"]:
+            plan_cache.record(message, call["query"], call["params"])
+
+    def add_message(self, message, turn=None):
+        """
+        Adds a user message and processes the assistant's answer.
+        Args:
+            message (str): The user message.
+            turn (Optional[TurnContext]): Cancellation token and deadline for this turn. Defaults
+                to a new turn with the configured TURN_DEADLINE_SECONDS.
+        """
+        turn = turn or TurnContext(config.turn_deadline_seconds)
+        recorder.record_turn(self.conversation_id, message)
+        self.active_turn = turn
+        token = current_turn.set(turn)
+        try:
+            self.process_message(message, turn)
+        except TurnCancelled as e:
+            print(f"⏹️  Turn cancelled: {e}")
+            self.messages.append(
+                {"role": "assistant", "content": f"The request was cancelled ({e})."}
+            )
+        finally:
+            current_turn.reset(token)
+            turn.close()
+            self.active_turn = None
+
+    def process_message(self, message, turn):
         print(f"🔄 Starting add_message with: '{message}'")
 
         msg = {"role": "user", "content": message}
         self.messages.append(msg)
+        self.last_turn_queries = []
+
+        if config.snapshots_enabled:
+            snapshot_answer = self.answer_from_snapshot(message)
+            if snapshot_answer is not None:
+                self.messages.append({"role": "assistant", "content": snapshot_answer})
+                print(f"🏁 Finished add_message processing from snapshot")
+                return
+
+        if config.plan_cache_enabled:
+            try:
+                cached_answer = self.answer_from_plan_cache(message, turn)
+            except TurnCancelled:
+                raise
+            except Exception as e:
+                print(f"❌ Error answering from plan cache: {e}")
+                cached_answer = None
+            if cached_answer is not None:
+                self.messages.append({"role": "assistant", "content": cached_answer})
+                print(f"🏁 Finished add_message processing from plan cache")
+                return
         
         try:
             # Get tools in the format expected by Responses API
-            tools = self.get_tools(use_mcp_tools=True)
+            tools = self.get_tools(use_mcp_tools=config.use_mcp_tools)
             
             # Make the API call to Responses API
             print(f"🚀 Making Responses API call...")
             try:
-                response = oai_client.responses.create(
+                response = self.create_response(
+                    turn,
                     input=self.get_messages(),
                     model=config.azure_openai_deployment_name,
                     temperature=0.7,
                     tools=tools,
                 )
                 print(f"✅ Responses API call completed, status: {response.status}")
+            except TurnCancelled:
+                raise
             except Exception as e:
                 print(f"❌ Error calling Responses API: {e}")
                 
             for output in response.output:
                 self.messages.append(output)
+            self.collect_sql_calls(response.output)
             # Handle function calls - loop until we get a text response
-            max_iterations = 5  # Prevent infinite loops
+            max_iterations = max_iterations_for(message)  # Prevent infinite loops
             iteration = 0
+            early_answer = None
 
             while iteration < max_iterations:
                 iteration += 1
+                turn.check()
                 print(f"🔄 Function call iteration {iteration}")
 
                 function_calls_to_process = []
@@ -187,6 +559,7 @@ class Conversation:
 
                 # Process function calls and create follow-up responses
                 function_inputs = []
+                raw_results = []
 
                 for item in function_calls_to_process:
                     try:
@@ -205,15 +578,35 @@ class Conversation:
                             args = {}
 
                         # Execute the function
-                        function_result = self.execute_function(function_name, args)
-                        self.messages.append(
-                            {
-                                "type": "function_call_output",
-                                "call_id": call_id,
-                                "output": function_result,
-                            }
-                        )
-
+                        turn.check()
+                        try:
+                            raw_result = self.call_function(function_name, args)
+                            function_result = str(raw_result)
+                        except TurnCancelled:
+                            raise
+                        except Exception as e:
+                            raw_result = None
+                            function_result = f"Error executing function {function_name}: {str(e)}"
+                            print(f"❌ {function_result}")
+                        raw_results.append((function_name, args, raw_result))
+                        if function_name == "run_sql_query":
+                            self.last_turn_queries.append(
+                                {
+                                    "query": args.get("query"),
+                                    "params": args.get("params") or [],
+                                    "ok": not is_sql_error(function_result),
+                                }
+                            )
+                        function_output = {
+                            "type": "function_call_output",
+                            "call_id": call_id,
+                            "output": function_result,
+                        }
+                        self.messages.append(function_output)
+                        function_inputs.append(function_output)
+
+                    except TurnCancelled:
+                        raise
                     except Exception as func_error:
                         print(f"❌ Error processing function call: {func_error}")
                         function_inputs.append({
@@ -222,16 +615,26 @@ class Conversation:
                             "output": f"Error: {str(func_error)}",
                         })
 
+                # A simple question answered by one small SQL result needs no follow-up model call
+                if len(raw_results) == 1:
+                    early_answer = direct_answer(message, *raw_results[0])
+                    if early_answer:
+                        print(f"⚡ Answering directly from {raw_results[0][0]} result, skipping follow-up call")
+                        break
+
                 # Create follow-up response with function results
                 print(f"🔄 Making follow-up API call with function results...")
-                response = oai_client.responses.create(
+                response = self.create_response(
+                    turn,
                     model=config.azure_openai_deployment_name,
                     previous_response_id=response.id,
                     input=function_inputs,
                     temperature=0.7,
                     tools=tools,
+                    max_output_tokens=config.followup_max_output_tokens,
                 )
                 print(f"✅ Follow-up API call completed")
+                self.collect_sql_calls(response.output)
 
                 # Check if we got a final text response
                 if hasattr(response, "output_text") and response.output_text:
@@ -255,10 +658,12 @@ class Conversation:
                 print(f"⚠️  Reached maximum iterations ({max_iterations}), stopping")
 
             # Extract the final response text
-            response_message = ""
+            response_message = early_answer or ""
 
             # Try to get output_text first
-            if hasattr(response, "output_text") and response.output_text:
+            if response_message:
+                print(f"✅ Got response from tool result: {response_message[:100]}...")
+            elif hasattr(response, "output_text") and response.output_text:
                 response_message = response.output_text
                 print(f"✅ Got response from output_text: {response_message[:100]}...")
             else:
@@ -290,11 +695,15 @@ class Conversation:
             if not response_message:
                 print(f"⚠️  No response text found, using default message")
                 response_message = "I'm sorry, I couldn't generate a response."
+            elif config.plan_cache_enabled:
+                self.remember_plan(message)
 
             response_dict = {"role": "assistant", "content": response_message}
             self.messages.append(response_dict)
             print(f"✅ Added assistant response, total messages: {len(self.messages)}")
 
+        except TurnCancelled:
+            raise
         except Exception as e:
             print(f"❌ Error in add_message: {e}")
             import traceback
@@ -0,0 +1,51 @@
+import importlib.util
+import threading
+from src.config import config
+
+# Process-wide Azure OpenAI client, built on first use and shared by the agent loop
+# and any batch runners so that concurrent conversations reuse a few warm connections.
+_sync_client = None
+_lock = threading.Lock()
+
+
+def _base_url() -> str:
+    return f"{config.azure_openai_endpoint.rstrip('/')}/openai/v1/"
+
+
+def _transport_options() -> dict:
+    """Connection pool, HTTP/2 and timeout settings for the client's transport."""
+    import httpx
+
+    http2 = config.openai_http2 and importlib.util.find_spec("h2") is not None
+    if config.openai_http2 and not http2:
+        print("⚠️  OPENAI_HTTP2 is enabled but the h2 package is not installed, using HTTP/1.1")
+    return {
+        "http2": http2,
+        "limits": httpx.Limits(
+            max_connections=config.openai_max_connections,
+            max_keepalive_connections=config.openai_max_keepalive_connections,
+            keepalive_expiry=config.openai_keepalive_expiry,
+        ),
+        "timeout": httpx.Timeout(config.openai_request_timeout, connect=config.openai_connect_timeout),
+    }
+
+
+def get_oai_client():
+    """Returns the process-wide synchronous Azure OpenAI client, constructing it on first use."""
+    global _sync_client
+    if _sync_client is None:
+        with _lock:
+            if _sync_client is None:
+                from openai import AzureOpenAI, DefaultHttpxClient
+
+                options = _transport_options()
+                _sync_client = AzureOpenAI(
+                    base_url=_base_url(),
+                    api_key=config.azure_openai_api_key,
+                    api_version="preview",  # Use "preview" for the new v1 Responses API
+                    http_client=DefaultHttpxClient(**options),
+                    timeout=options["timeout"],
+                    max_retries=config.openai_max_retries,
+                )
+    return _sync_client
+
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import random
+import sqlite3
+import time
+from typing import Any, Dict, List
+from uuid import uuid4
+from src.config import config
+
+# Small sales schema for the SQLite stand-in used by load tests (SQL_STANDIN_PATH)
+STANDIN_SCHEMA = """
+CREATE TABLE IF NOT EXISTS Customer (CustomerID INTEGER PRIMARY KEY, CompanyName TEXT, Region TEXT);
+CREATE TABLE IF NOT EXISTS Product (ProductID INTEGER PRIMARY KEY, Name TEXT, Category TEXT, ListPrice REAL);
+CREATE TABLE IF NOT EXISTS SalesOrder (
+    SalesOrderID INTEGER PRIMARY KEY,
+    CustomerID INTEGER,
+    ProductID INTEGER,
+    OrderDate TEXT,
+    Quantity INTEGER,
+    Amount REAL
+);
+"""
+REGIONS = ["West", "East", "North", "South", "Central"]
+CATEGORIES = ["Bikes", "Components", "Clothing", "Accessories"]
+
+# Queries the stub model "writes"; a mix of small lookups and larger result sets
+STUB_QUERIES = [
+    "SELECT COUNT(*) AS Orders FROM SalesOrder",
+    "SELECT Region, SUM(Amount) AS Total FROM SalesOrder o JOIN Customer c ON c.CustomerID = o.CustomerID GROUP BY Region",
+    "SELECT p.Category, SUM(o.Quantity) AS Units FROM SalesOrder o JOIN Product p ON p.ProductID = o.ProductID GROUP BY p.Category",
+    "SELECT Name, ListPrice FROM Product ORDER BY ListPrice DESC LIMIT 10",
+    "SELECT c.CompanyName, SUM(o.Amount) AS Total FROM SalesOrder o JOIN Customer c ON c.CustomerID = o.CustomerID "
+    "GROUP BY c.CompanyName ORDER BY Total DESC LIMIT 25",
+    "SELECT * FROM SalesOrder ORDER BY OrderDate DESC LIMIT 200",
+]
+
+
+def seed_standin(path: str, customers: int = 500, products: int = 200, orders: int = 20000):
+    """Creates and fills the SQLite stand-in database unless it already has data."""
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript(STANDIN_SCHEMA)
+        if conn.execute("SELECT COUNT(*) FROM SalesOrder").fetchone()[0]:
+            return
+        rng = random.Random(42)
+        conn.executemany(
+            "INSERT INTO Customer VALUES (?, ?, ?)",
+            [(i, f"Customer {i}", rng.choice(REGIONS)) for i in range(1, customers + 1)],
+        )
+        conn.executemany(
+            "INSERT INTO Product VALUES (?, ?, ?, ?)",
+            [(i, f"Product {i}", rng.choice(CATEGORIES), round(rng.uniform(5, 3000), 2)) for i in range(1, products + 1)],
+        )
+        conn.executemany(
+            "INSERT INTO SalesOrder VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    i,
+                    rng.randint(1, customers),
+                    rng.randint(1, products),
+                    f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                    rng.randint(1, 10),
+                    round(rng.uniform(10, 5000), 2),
+                )
+                for i in range(1, orders + 1)
+            ],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _last_user_message(messages: Any) -> str:
+    for message in reversed(messages if isinstance(messages, list) else []):
+        if isinstance(message, dict) and message.get("role") == "user":
+            return str(message.get("content") or "")
+    return ""
+
+
+def _response(output: List[Dict[str, Any]]):
+    from openai.types.responses import Response
+
+    return Response.model_validate({
+        "id": f"resp_{uuid4().hex}",
+        "object": "response",
+        "created_at": time.time(),
+        "model": "stub",
+        "status": "completed",
+        "output": output,
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": [],
+    })
+
+
+def _message(text: str) -> Dict[str, Any]:
+    return {
+        "type": "message",
+        "id": f"msg_{uuid4().hex}",
+        "role": "assistant",
+        "status": "completed",
+        "content": [{"type": "output_text", "text": text, "annotations": []}],
+    }
+
+
+def stub_response(kwargs: Dict[str, Any]):
+    """
+    Stands in for a Responses API call during load tests (LLM_STUB_ENABLED).
+
+    The first call of a turn answers with one run_sql_query call chosen from the question, so
+    the SQL path is exercised; follow-up calls answer with a short message. Each call waits
+    LLM_STUB_LATENCY_SECONDS with +/-50% jitter to model the LLM's latency.
+    """
+    latency = config.llm_stub_latency_seconds
+    if latency > 0:
+        time.sleep(random.uniform(0.5 * latency, 1.5 * latency))
+
+    tool_names = {tool.get("name") for tool in kwargs.get("tools") or [] if isinstance(tool, dict)}
+    if kwargs.get("previous_response_id") is None and "run_sql_query" in tool_names:
+        question = _last_user_message(kwargs.get("input"))
+        digest = int(hashlib.sha1(question.encode("utf-8")).hexdigest(), 16)
+        query = STUB_QUERIES[digest % len(STUB_QUERIES)]
+        return _response([{
+            "type": "function_call",
+            "id": f"fc_{uuid4().hex}",
+            "call_id": f"call_{uuid4().hex}",
+            "name": "run_sql_query",
+            "arguments": json.dumps({"query": query, "params": []}),
+            "status": "completed",
+        }])
+    return _response([_message("Here is a summary of the results (stub answer).")])
@@ -0,0 +1,201 @@
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from src.config import config
+
+# Only read-only statements are ever replayed from the cache
+READ_ONLY_PATTERN = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+# Matches both the list form ([{'error': ...}]) and the MCP server's {"error": ...} form
+SQL_ERROR_PATTERN = re.compile(r"""^\s*((\[\s*)?\{\s*['"]error['"]|Error\b)""")
+NUMBER_PATTERN = re.compile(r"[-+]?\d+(?:[.,]\d+)*")
+# Slot pattern for templates persisted before slot shapes were recorded: a single word
+WORD_PATTERN = r"\S+"
+
+
+def normalize_question(question: str) -> str:
+    """Collapses whitespace and strips trailing punctuation, preserving case."""
+    text = re.sub(r"\s+", " ", question or "").strip()
+    return text.rstrip(" ?.!")
+
+
+def is_sql_error(output: Any) -> bool:
+    """Returns True if a tool output looks like a failed run_sql_query call."""
+    if isinstance(output, list):
+        return bool(output) and isinstance(output[0], dict) and "error" in output[0]
+    return bool(SQL_ERROR_PATTERN.match(str(output or "")))
+
+
+def _slot_pattern(value: str) -> str:
+    """Regex a slot may match: a number for numeric literals, otherwise as many words as the literal."""
+    if NUMBER_PATTERN.fullmatch(value):
+        return NUMBER_PATTERN.pattern
+    words = len(value.split())
+    return WORD_PATTERN + r"(?: \S+)" * (words - 1)
+
+
+def _find_value(text: str, value: str, taken: List[Tuple[int, int]]) -> Optional[Tuple[int, int]]:
+    """Finds a case-insensitive, word-bounded occurrence of value that does not overlap taken spans."""
+    pattern = re.compile(r"(?<!\w)" + re.escape(value) + r"(?!\w)", re.IGNORECASE)
+    for match in pattern.finditer(text):
+        start, end = match.span()
+        if all(end <= s or start >= e for s, e in taken):
+            return start, end
+    return None
+
+
+class PlanCache:
+    """
+    Index of parameterized SQL templates keyed by the shape of the question that produced them.
+
+    A template is learned from a turn that answered a question with exactly one successful
+    run_sql_query call. Every query parameter that also appears literally in the question
+    becomes a slot; the rest of the question is the shape. A later question with the same
+    shape binds its own values into the slots and runs the query directly.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 500):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._templates: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._patterns: Dict[str, re.Pattern] = {}
+        self._load()
+
+    @staticmethod
+    def _shape_key(segments: Sequence[Any]) -> str:
+        return "".join(
+            segment.lower() if isinstance(segment, str) else f"{{{segment}}}"
+            for segment in segments
+        )
+
+    @staticmethod
+    def _compile(template: Dict[str, Any]) -> re.Pattern:
+        # Slots only match values shaped like the literal they were learned from, so extra
+        # words in a new question make the lookup miss instead of leaking into a parameter
+        slot_patterns = template.get("slot_patterns", {})
+        parts = []
+        for segment in template["segments"]:
+            if isinstance(segment, str):
+                parts.append(re.escape(segment))
+            else:
+                parts.append(f"(?P<s{segment}>{slot_patterns.get(str(segment), WORD_PATTERN)})")
+        return re.compile("".join(parts), re.IGNORECASE)
+
+    def build_template(self, question: str, query: str, params: Sequence[Any]) -> Optional[Dict[str, Any]]:
+        """Builds a template from a question and the query/params that answered it."""
+        if not READ_ONLY_PATTERN.match(query or ""):
+            return None
+        text = normalize_question(question)
+        if not text:
+            return None
+
+        spans: List[Tuple[int, int, int]] = []
+        slots_by_value: Dict[str, int] = {}
+        slot_patterns: Dict[str, str] = {}
+        param_specs: List[Dict[str, Any]] = []
+        for value in params or ():
+            needle = str(value).strip()
+            if needle.lower() in slots_by_value:
+                param_specs.append({"slot": slots_by_value[needle.lower()]})
+                continue
+            span = _find_value(text, needle, [(s, e) for s, e, _ in spans]) if needle else None
+            if span is None:
+                param_specs.append({"value": value})
+                continue
+            slot = len(slots_by_value)
+            slots_by_value[needle.lower()] = slot
+            slot_patterns[str(slot)] = _slot_pattern(needle)
+            spans.append((span[0], span[1], slot))
+            param_specs.append({"slot": slot})
+
+        segments: List[Any] = []
+        position = 0
+        for start, end, slot in sorted(spans):
+            if start > position:
+                segments.append(text[position:start])
+            segments.append(slot)
+            position = end
+        if position < len(text):
+            segments.append(text[position:])
+
+        return {
+            "segments": segments,
+            "slot_patterns": slot_patterns,
+            "query": query,
+            "params": param_specs,
+            "hits": 0,
+        }
+
+    def record(self, question: str, query: str, params: Sequence[Any]) -> bool:
+        """Learns a template from a successful turn. Returns True if a template was stored."""
+        template = self.build_template(question, query, params)
+        if template is None:
+            return False
+        key = self._shape_key(template["segments"])
+        with self._lock:
+            existing = self._templates.pop(key, None)
+            if existing:
+                template["hits"] = existing.get("hits", 0)
+            self._templates[key] = template
+            self._patterns[key] = self._compile(template)
+            while len(self._templates) > self.max_entries:
+                evicted, _ = self._templates.popitem(last=False)
+                self._patterns.pop(evicted, None)
+        self._save()
+        print(f"🗂️  Plan cache stored template for shape '{key}'")
+        return True
+
+    def lookup(self, question: str) -> Optional[Tuple[str, Tuple[Any, ...]]]:
+        """
+        Finds a template matching the question and binds its parameters.
+        Returns:
+            Optional[Tuple[str, Tuple[Any, ...]]]: The query and bound params, or None on a miss.
+        """
+        text = normalize_question(question)
+        with self._lock:
+            for key in reversed(self._templates):
+                match = self._patterns[key].fullmatch(text)
+                if not match:
+                    continue
+                template = self._templates[key]
+                self._templates.move_to_end(key)
+                template["hits"] = template.get("hits", 0) + 1
+                params = tuple(
+                    match.group(f"s{spec['slot']}").strip() if "slot" in spec else spec["value"]
+                    for spec in template["params"]
+                )
+                return template["query"], params
+        return None
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                templates = json.load(f)
+            for template in templates:
+                key = self._shape_key(template["segments"])
+                self._templates[key] = template
+                self._patterns[key] = self._compile(template)
+            print(f"🗂️  Loaded {len(self._templates)} plan cache templates from {self.path}")
+        except Exception as e:
+            print(f"❌ Error loading plan cache from {self.path}: {e}")
+
+    def _save(self):
+        if not self.path:
+            return
+        try:
+            with self._lock:
+                templates = list(self._templates.values())
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(templates, f, default=str)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"❌ Error saving plan cache to {self.path}: {e}")
+
+
+plan_cache = PlanCache(config.plan_cache_path)
@@ -0,0 +1,146 @@
+import functools
+import gzip
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+from src.config import config
+
+OFF = "off"
+RECORD = "record"
+REPLAY = "replay"
+
+
+def _key(kind: str, payload: Any) -> str:
+    data = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha1(f"{kind}:{data}".encode("utf-8")).hexdigest()
+
+
+def _llm_key(kwargs: Dict[str, Any]) -> str:
+    return _key("llm", {"input": kwargs.get("input"), "previous_response_id": kwargs.get("previous_response_id")})
+
+
+def _sql_key(query: str, params: Any) -> str:
+    return _key("sql", {"query": re.sub(r"\s+", " ", query or "").strip(), "params": list(params or ())})
+
+
+class Recorder:
+    """
+    Records Responses API and run_sql_query interactions to a gzipped JSON-lines log and replays them.
+
+    In record mode every user turn, model call and SQL call is appended with its latency.
+    In replay mode model and SQL calls never leave the process: each call is answered with
+    the recorded result whose request matches after sleeping for the recorded latency times
+    REPLAY_LATENCY_SCALE; a request that was never recorded raises LookupError.
+    """
+
+    def __init__(self, mode: str = OFF, path: Optional[str] = None, latency_scale: float = 1.0):
+        self.mode = mode
+        self.path = path
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        self._file = None
+        self._by_key: Dict[str, Deque[Dict[str, Any]]] = defaultdict(deque)
+        self.counters: Dict[str, int] = defaultdict(int)
+        if mode == REPLAY:
+            self.load(path)
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == RECORD
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == REPLAY
+
+    def load(self, path: str):
+        """Loads a recording for replay."""
+        self._by_key.clear()
+        for entry in read_recording(path):
+            if entry["kind"] in ("llm", "sql"):
+                self._by_key[entry["key"]].append(entry)
+
+    def _write(self, entry: Dict[str, Any]):
+        line = json.dumps(entry, default=str) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = gzip.open(self.path, "at", encoding="utf-8")
+            self._file.write(line)
+            self._file.flush()
+
+    def record_turn(self, conversation_id: str, message: str):
+        if self.recording:
+            self._write({"kind": "turn", "conversation_id": conversation_id, "message": message, "at": time.time()})
+
+    def _next(self, kind: str, key: str) -> Dict[str, Any]:
+        with self._lock:
+            queue = self._by_key.get(key)
+            if not queue:
+                # Serving another recorded call instead would hide that the turn took a different path
+                raise LookupError(f"Recording has no matching {kind} interaction to replay")
+            entry = queue.popleft()
+        if self.latency_scale > 0:
+            time.sleep(entry["seconds"] * self.latency_scale)
+        return entry
+
+    def llm_call(self, call: Callable[..., Any], kwargs: Dict[str, Any]) -> Any:
+        """Runs (or replays) one Responses API call and returns the final response."""
+        self.counters["llm_calls"] += 1
+        if self.replaying:
+            from openai.types.responses import Response
+
+            return Response.model_validate(self._next("llm", _llm_key(kwargs))["response"])
+        started = time.perf_counter()
+        response = call()
+        if self.recording:
+            request = {name: value for name, value in kwargs.items() if name not in ("tools", "timeout")}
+            self._write({
+                "kind": "llm",
+                "key": _llm_key(kwargs),
+                "request": request,
+                "response": response.model_dump(mode="json"),
+                "seconds": time.perf_counter() - started,
+            })
+        return response
+
+    def sql_call(self, call: Callable[..., Any], query: str, params: Any) -> Any:
+        """Runs (or replays) one run_sql_query call."""
+        self.counters["sql_calls"] += 1
+        if self.replaying:
+            return self._next("sql", _sql_key(query, params))["result"]
+        started = time.perf_counter()
+        result = call()
+        if self.recording:
+            self._write({
+                "kind": "sql",
+                "key": _sql_key(query, params),
+                "query": query,
+                "params": list(params or ()),
+                "result": result,
+                "seconds": time.perf_counter() - started,
+            })
+        return result
+
+
+def read_recording(path: str) -> List[Dict[str, Any]]:
+    """Reads every entry of a recording."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def recorded_sql(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Decorator routing a run_sql_query-style function through the recorder."""
+
+    @functools.wraps(fn)
+    def wrapper(query, params=()):
+        if recorder.mode == OFF:
+            return fn(query, params)
+        return recorder.sql_call(lambda: fn(query, params), query, params)
+
+    return wrapper
+
+
+recorder = Recorder(config.recording_mode, config.recording_path, config.replay_latency_scale)
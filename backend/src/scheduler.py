@@ -0,0 +1,204 @@
+import contextvars
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+from src.config import config
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+# Per-user limit bucket shared by every caller that sends no user identity
+ANONYMOUS_USER = "anonymous"
+
+# Workload class of the work running on the current thread, read by sqlutil to pick a pool partition
+current_workload: contextvars.ContextVar[str] = contextvars.ContextVar("current_workload", default=INTERACTIVE)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a turn cannot be admitted; retry_after is a suggested delay in seconds."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    def __init__(self, user: str, tenant: Optional[str], start_tag: float, finish_tag: float):
+        self.user = user
+        self.tenant = tenant
+        self.start_tag = start_tag
+        self.finish_tag = finish_tag
+        self.admitted = threading.Event()
+        self.started_at: Optional[float] = None
+
+
+class TurnScheduler:
+    """
+    Admission control and weighted fair queuing between the Flask routes and the agent loop.
+
+    Every (tenant, user) pair is a flow. Waiting turns are ordered by their virtual finish
+    tag (start-time fair queuing with per-tenant weights), so a user who submits many turns
+    only gets their fair share of the worker while others are waiting. A turn is dispatched
+    only if the global, per-user and per-tenant concurrency limits all allow it. Callers
+    without a user identity share one anonymous per-user limit, and their flow is the
+    caller-supplied flow key, e.g. the conversation id; callers without a tenant skip the
+    per-tenant limit. When the queue is full, or a turn waits too long, the caller gets
+    AdmissionRejected and the route answers 429 with Retry-After.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        max_per_user: int,
+        max_per_tenant: int,
+        max_queue: int,
+        max_wait_seconds: float,
+        tenant_weights: Optional[Dict[str, float]] = None,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_per_user = max_per_user
+        self.max_per_tenant = max_per_tenant
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self.tenant_weights = tenant_weights or {}
+        self._lock = threading.Lock()
+        self._queue: List[Tuple[float, int, _Waiter]] = []
+        self._sequence = itertools.count()
+        self._virtual_time = 0.0
+        self._last_finish: Dict[Tuple[str, str], float] = defaultdict(float)
+        self._running = 0
+        self._running_by_user: Dict[str, int] = defaultdict(int)
+        self._running_by_tenant: Dict[str, int] = defaultdict(int)
+        # Exponentially weighted average turn duration, used for Retry-After estimates
+        self._average_seconds = 5.0
+        self.rejected = 0
+
+    def _retry_after(self) -> int:
+        backlog = len(self._queue) + 1
+        return max(1, math.ceil(self._average_seconds * backlog / max(1, self.max_concurrent)))
+
+    def _can_run(self, waiter: _Waiter) -> bool:
+        return (
+            self._running < self.max_concurrent
+            and self._running_by_user[waiter.user] < self.max_per_user
+            and (waiter.tenant is None or self._running_by_tenant[waiter.tenant] < self.max_per_tenant)
+        )
+
+    def _start(self, waiter: _Waiter):
+        self._running += 1
+        self._running_by_user[waiter.user] += 1
+        if waiter.tenant is not None:
+            self._running_by_tenant[waiter.tenant] += 1
+        self._virtual_time = max(self._virtual_time, waiter.start_tag)
+        waiter.admitted.set()
+
+    def _dispatch(self):
+        """Admits the waiting turns with the smallest finish tags whose limits allow them to run."""
+        if not self._queue or self._running >= self.max_concurrent:
+            return
+        blocked = []
+        while self._queue and self._running < self.max_concurrent:
+            entry = heapq.heappop(self._queue)
+            waiter = entry[2]
+            if self._can_run(waiter):
+                self._start(waiter)
+            else:
+                blocked.append(entry)
+        for entry in blocked:
+            heapq.heappush(self._queue, entry)
+
+    def release(self, waiter: _Waiter):
+        """Frees the slot taken by acquire() and admits the next waiting turns."""
+        elapsed = time.monotonic() - waiter.started_at
+        with self._lock:
+            self._running -= 1
+            self._running_by_user[waiter.user] -= 1
+            if waiter.tenant is not None:
+                self._running_by_tenant[waiter.tenant] -= 1
+            self._average_seconds = 0.9 * self._average_seconds + 0.1 * elapsed
+            self._dispatch()
+
+    def acquire(self, user: Optional[str], tenant: Optional[str], flow: Optional[str] = None) -> _Waiter:
+        """
+        Blocks until a turn may run and returns the admitted waiter, to be passed to release().
+        Args:
+            user (Optional[str]): Caller identity for per-user limits; None uses the shared anonymous limit.
+            tenant (Optional[str]): Tenant for per-tenant limits and weights; None skips them.
+            flow (Optional[str]): Fair-queuing flow for callers without a user identity.
+        Raises:
+            AdmissionRejected: If the queue is full or the turn waited longer than max_wait_seconds.
+        """
+        flow = (tenant, user if user is not None else flow)
+        weight = self.tenant_weights.get(tenant, 1.0)
+        with self._lock:
+            start_tag = max(self._virtual_time, self._last_finish[flow])
+            waiter = _Waiter(user if user is not None else ANONYMOUS_USER, tenant, start_tag, start_tag + 1.0 / weight)
+            if not self._queue and self._can_run(waiter):
+                self._last_finish[flow] = waiter.finish_tag
+                self._start(waiter)
+            elif len(self._queue) >= self.max_queue:
+                self.rejected += 1
+                raise AdmissionRejected("Server is busy, please retry later", self._retry_after())
+            else:
+                self._last_finish[flow] = waiter.finish_tag
+                heapq.heappush(self._queue, (waiter.finish_tag, next(self._sequence), waiter))
+                self._dispatch()
+
+        try:
+            admitted = waiter.admitted.wait(self.max_wait_seconds)
+        except BaseException:
+            # Interrupted while waiting: give up the place in the queue, or the slot if it was just granted
+            if not self._abandon(waiter):
+                waiter.started_at = time.monotonic()
+                self.release(waiter)
+            raise
+        if not admitted and self._abandon(waiter):
+            with self._lock:
+                self.rejected += 1
+                raise AdmissionRejected("Timed out waiting for a free slot", self._retry_after())
+        waiter.started_at = time.monotonic()
+        return waiter
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """Removes a waiter that stopped waiting from the queue; False if it was admitted meanwhile."""
+        with self._lock:
+            if waiter.admitted.is_set():
+                return False
+            self._queue = [entry for entry in self._queue if entry[2] is not waiter]
+            heapq.heapify(self._queue)
+            return True
+
+    @contextmanager
+    def admit(self, user: Optional[str], tenant: Optional[str], workload: str = INTERACTIVE, flow: Optional[str] = None):
+        """Runs the block once admitted (see acquire), under the given workload class."""
+        waiter = self.acquire(user, tenant, flow)
+        token = current_workload.set(workload)
+        try:
+            yield
+        finally:
+            current_workload.reset(token)
+            self.release(waiter)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "running": self._running,
+                "queued": len(self._queue),
+                "rejected": self.rejected,
+                "average_turn_seconds": round(self._average_seconds, 2),
+            }
+
+
+scheduler = TurnScheduler(
+    config.scheduler_max_concurrent_turns,
+    config.scheduler_max_concurrent_per_user,
+    config.scheduler_max_concurrent_per_tenant,
+    config.scheduler_max_queue,
+    config.scheduler_max_wait_seconds,
+    config.scheduler_tenant_weights,
+)
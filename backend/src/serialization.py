@@ -0,0 +1,213 @@
+import base64
+import datetime
+import decimal
+import gzip
+import io
+import json
+import uuid
+import zlib
+from typing import Any, Iterable, Iterator, List, Dict, Optional, Sequence
+from flask import Response, request
+from flask.json.provider import DefaultJSONProvider
+from src.config import config
+
+# Optional accelerators: orjson for encoding, brotli for compression
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the deployment
+    orjson = None
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depends on the deployment
+    brotli = None
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+ARROW_MIMETYPE = "application/vnd.apache.arrow.stream"
+
+
+def json_default(value: Any) -> Any:
+    """Encodes the SQL Server types pyodbc returns that JSON has no native form for."""
+    if isinstance(value, decimal.Decimal):
+        # As a string, like Flask's default provider, so money and high-precision values stay exact
+        return str(value)
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(bytes(value)).decode("ascii")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    """Serializes obj to UTF-8 JSON, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=json_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=json_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson that understands Decimal, datetime, UUID and bytes."""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if orjson is not None and not kwargs:
+            return dumps_bytes(obj).decode("utf-8")
+        kwargs.setdefault("default", json_default)
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype=self.mimetype)
+
+
+def negotiate_encoding() -> Optional[str]:
+    """Picks the best response encoding the client accepts, or None."""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return None
+
+
+def compress_response(response: Response) -> Response:
+    """after_request hook that compresses large buffered responses with brotli or gzip."""
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or response.status_code < 200
+        or response.status_code in (204, 304)
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+    data = response.get_data()
+    if len(data) < config.response_compression_min_bytes:
+        return response
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+
+    if encoding == "br":
+        compressed = brotli.compress(data, quality=min(11, config.response_compression_level))
+    else:
+        compressed = gzip.compress(data, compresslevel=config.response_compression_level)
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    response.headers["Content-Length"] = str(len(compressed))
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def gzip_stream(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Gzips a chunked stream, flushing after every chunk so the client can decode incrementally."""
+    compressor = zlib.compressobj(config.response_compression_level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def ndjson_stream(batches: Iterable[List[Dict[str, Any]]]) -> Iterator[bytes]:
+    """Encodes batches of rows as newline-delimited JSON, one chunk per batch."""
+    for batch in batches:
+        yield b"".join(dumps_bytes(row) + b"\n" for row in batch)
+
+
+def arrow_type(type_code: Any, precision: Optional[int], scale: Optional[int]):
+    """Maps a pyodbc cursor.description type code to an Arrow type."""
+    import pyarrow as pa
+
+    if type_code is bool:
+        return pa.bool_()
+    if type_code is int:
+        return pa.int64()
+    if type_code is float:
+        return pa.float64()
+    if type_code is decimal.Decimal:
+        return pa.decimal128(min(precision or 38, 38), scale or 0)
+    if type_code is datetime.datetime:
+        return pa.timestamp("us")
+    if type_code is datetime.date:
+        return pa.date32()
+    if type_code is datetime.time:
+        return pa.time64("us")
+    if type_code in (bytes, bytearray):
+        return pa.binary()
+    return pa.string()
+
+
+def arrow_schema(description: Optional[Sequence[tuple]], rows: List[Dict[str, Any]] = ()):
+    """
+    Builds the Arrow schema of a result from its cursor.description, so every batch shares it.
+    Columns without a Python type code (the SQLite stand-in, the DuckDB cache) are inferred from
+    rows; columns that cannot be inferred, e.g. all NULL, become strings.
+    """
+    import pyarrow as pa
+
+    if not description:
+        description = [(name, None, None, None, None, None, True) for name in (rows[0] if rows else {})]
+    fields = []
+    for column in description:
+        name, type_code = column[0], column[1]
+        if isinstance(type_code, type):
+            field_type = arrow_type(type_code, column[4], column[5])
+        else:
+            try:
+                field_type = pa.array([row.get(name) for row in rows]).type
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                field_type = pa.string()
+            if pa.types.is_null(field_type):
+                field_type = pa.string()
+        fields.append(pa.field(name, field_type))
+    return pa.schema(fields)
+
+
+def arrow_record_batch(rows: List[Dict[str, Any]], schema):
+    """Converts rows to a record batch of the given schema; string columns take any value's text form."""
+    import pyarrow as pa
+
+    columns = {}
+    for field in schema:
+        values = [row.get(field.name) for row in rows]
+        if pa.types.is_string(field.type):
+            values = [value if value is None or isinstance(value, str) else str(value) for value in values]
+        columns[field.name] = values
+    return pa.RecordBatch.from_pydict(columns, schema=schema)
+
+
+def arrow_stream(batches: Iterable[List[Dict[str, Any]]], description: Optional[Sequence[tuple]] = None) -> Iterator[bytes]:
+    """
+    Encodes batches of rows as an Arrow IPC stream, one record batch per chunk.
+    Args:
+        batches (Iterable[List[Dict[str, Any]]]): Batches of rows.
+        description (Optional[Sequence[tuple]]): The query's cursor.description; the schema is
+            built from it rather than from the first batch, whose values may all be NULL.
+    """
+    import pyarrow as pa
+
+    sink = io.BytesIO()
+    writer = None
+    schema = None
+    for batch in batches:
+        if writer is None:
+            schema = arrow_schema(description, batch)
+            writer = pa.ipc.new_stream(sink, schema)
+        writer.write_batch(arrow_record_batch(batch, schema))
+        yield _drain(sink)
+    if writer is not None:
+        writer.close()
+        yield _drain(sink)
+
+
+def _drain(sink: io.BytesIO) -> bytes:
+    """Returns the bytes written to the sink so far and empties it."""
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
@@ -0,0 +1,305 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from uuid import uuid4
+from src.config import config
+from src.plancache import READ_ONLY_PATTERN, is_sql_error, normalize_question
+from src.scheduler import BATCH, current_workload
+from src.sqlutil import run_sql_query
+
+# Optional: coordinates worker processes sharing the snapshots file (not available on Windows)
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - depends on the platform
+    fcntl = None
+
+# Upper bound on how long the refresher sleeps, so newly pinned snapshots are picked up promptly
+MAX_REFRESH_SLEEP_SECONDS = 60
+
+
+def _question_key(question: str) -> str:
+    return normalize_question(question).lower()
+
+
+def _timestamp(seconds: Optional[float]) -> Optional[str]:
+    if seconds is None:
+        return None
+    return datetime.fromtimestamp(seconds, timezone.utc).isoformat(timespec="seconds")
+
+
+class SnapshotStore:
+    """
+    Pinned questions whose SQL is re-run in the background so their answer is always materialized.
+
+    A snapshot stores the question, the read-only query that answered it and its latest result.
+    A background thread re-runs each query on the batch SQL pool partition once its TTL has
+    elapsed. A question matching a pinned question (ignoring case, whitespace and trailing
+    punctuation) is answered from the stored result with its refresh time.
+
+    Nothing is read and no thread is started until the store is first used. Several worker
+    processes can share one snapshots file: changes are written under a file lock on top of the
+    latest file contents, every process reloads the file when its modification time changes,
+    and only the process holding the refresh lock re-runs queries. Hit counts are per process.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_rows: int = 5000):
+        self.path = path
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._snapshots: Dict[str, Dict[str, Any]] = {}
+        self._by_question: Dict[str, str] = {}
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._loaded = False
+        self._file_version = None
+        self._refresh_lock_file = None
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._refresh_loop, name="snapshot-refresh", daemon=True)
+                self._thread.start()
+
+    def _sync(self):
+        """Loads the snapshots file on first use and again whenever another process has changed it."""
+        version = self._version()
+        if self._loaded and version == self._file_version:
+            return
+        self._load(version)
+        if self._snapshots:
+            self._start()
+
+    def pin(self, question: str, query: str, params: Sequence[Any], ttl_seconds: int) -> Dict[str, Any]:
+        """
+        Pins a question to the query that answered it and materializes its first result.
+        Raises:
+            ValueError: If the query is not read-only or its first run fails.
+        """
+        if not READ_ONLY_PATTERN.match(query or ""):
+            raise ValueError("Only SELECT queries can be pinned")
+        key = _question_key(question)
+        if not key:
+            raise ValueError("Cannot pin an empty question")
+        snapshot = {
+            "id": str(uuid4()),
+            "question": normalize_question(question),
+            "query": query,
+            "params": list(params or ()),
+            "ttl_seconds": max(1, int(ttl_seconds)),
+            "created_at": time.time(),
+            "refreshed_at": None,
+            "result": None,
+            "error": None,
+            "hits": 0,
+        }
+        self.refresh(snapshot)
+        if snapshot["result"] is None:
+            raise ValueError(f"Pinned query failed: {snapshot['error']}")
+
+        def add():
+            previous = self._by_question.get(key)
+            if previous:
+                self._snapshots.pop(previous, None)
+            self._snapshots[snapshot["id"]] = snapshot
+            self._by_question[key] = snapshot["id"]
+
+        self._commit(add)
+        self._start()
+        self._wake.set()
+        print(f"📌 Pinned snapshot {snapshot['id']} for '{snapshot['question']}'")
+        return self.describe(snapshot)
+
+    def remove(self, snapshot_id: str) -> bool:
+        removed = []
+
+        def drop():
+            snapshot = self._snapshots.pop(snapshot_id, None)
+            if snapshot is not None:
+                self._by_question.pop(_question_key(snapshot["question"]), None)
+                removed.append(snapshot)
+
+        self._commit(drop)
+        return bool(removed)
+
+    def lookup(self, question: str) -> Optional[Dict[str, Any]]:
+        """Returns the snapshot pinned for this question, if it has a result."""
+        self._sync()
+        with self._lock:
+            snapshot_id = self._by_question.get(_question_key(question))
+            snapshot = self._snapshots.get(snapshot_id) if snapshot_id else None
+            if snapshot is None or snapshot["result"] is None:
+                return None
+            snapshot["hits"] += 1
+            return snapshot
+
+    def refresh(self, snapshot: Dict[str, Any]):
+        """Re-runs a snapshot's query, keeping the previous result if the run fails."""
+        token = current_workload.set(BATCH)
+        started = time.perf_counter()
+        try:
+            rows = run_sql_query(snapshot["query"], tuple(snapshot["params"]))
+        finally:
+            current_workload.reset(token)
+        if is_sql_error(rows):
+            snapshot["error"] = rows[0]["error"]
+            print(f"⚠️  Snapshot refresh failed for '{snapshot['question']}': {snapshot['error']}")
+        elif len(rows) > self.max_rows:
+            snapshot["error"] = f"Result has {len(rows)} rows, more than SNAPSHOT_MAX_ROWS={self.max_rows}"
+            print(f"⚠️  {snapshot['error']}")
+        else:
+            snapshot["result"] = rows
+            snapshot["error"] = None
+            snapshot["refreshed_at"] = time.time()
+            print(f"🔁 Snapshot '{snapshot['question']}' refreshed in {time.perf_counter() - started:.2f}s")
+        # A failed refresh is retried after the TTL rather than in a tight loop
+        snapshot["attempted_at"] = time.time()
+
+    def _due(self, snapshot: Dict[str, Any], now: float) -> float:
+        """Seconds until the snapshot should be refreshed (<= 0 when due)."""
+        last = snapshot.get("attempted_at") or snapshot["refreshed_at"] or 0
+        return last + snapshot["ttl_seconds"] - now
+
+    def _is_refresher(self) -> bool:
+        """With several worker processes sharing the file, only the one holding the refresh lock re-runs queries."""
+        if not self.path or fcntl is None:
+            return True
+        if self._refresh_lock_file is None:
+            lock_file = open(f"{self.path}.refresh.lock", "a")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+            # Held for the life of the process; the OS releases it if the process dies
+            self._refresh_lock_file = lock_file
+        return True
+
+    def _refresh_loop(self):
+        while True:
+            self._sync()
+            if not self._is_refresher():
+                # Another process refreshes; pick up its results from the file
+                self._wake.wait(MAX_REFRESH_SLEEP_SECONDS)
+                self._wake.clear()
+                continue
+            with self._lock:
+                snapshots = list(self._snapshots.values())
+            now = time.time()
+            refreshed = []
+            for snapshot in snapshots:
+                if self._due(snapshot, now) <= 0:
+                    try:
+                        self.refresh(snapshot)
+                        refreshed.append(snapshot)
+                    except Exception as e:
+                        snapshot["attempted_at"] = time.time()
+                        print(f"❌ Error refreshing snapshot {snapshot['id']}: {e}")
+            if refreshed:
+                def update():
+                    # Snapshots removed meanwhile, here or by another process, stay removed
+                    for snapshot in refreshed:
+                        if snapshot["id"] in self._snapshots:
+                            self._snapshots[snapshot["id"]] = snapshot
+
+                self._commit(update)
+            now = time.time()
+            with self._lock:
+                waits = [self._due(snapshot, now) for snapshot in self._snapshots.values()]
+            self._wake.wait(min([MAX_REFRESH_SLEEP_SECONDS] + waits) if waits else MAX_REFRESH_SLEEP_SECONDS)
+            self._wake.clear()
+
+    @staticmethod
+    def describe(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+        """Snapshot metadata without its result rows."""
+        return {
+            "id": snapshot["id"],
+            "question": snapshot["question"],
+            "query": snapshot["query"],
+            "params": snapshot["params"],
+            "ttl_seconds": snapshot["ttl_seconds"],
+            "refreshed_at": _timestamp(snapshot["refreshed_at"]),
+            "rows": len(snapshot["result"] or []),
+            "error": snapshot["error"],
+            "hits": snapshot["hits"],
+        }
+
+    def list(self) -> List[Dict[str, Any]]:
+        self._sync()
+        with self._lock:
+            return [self.describe(snapshot) for snapshot in self._snapshots.values()]
+
+    def _version(self):
+        """Identifies the current contents of the snapshots file, or None if there is none."""
+        if not self.path:
+            return None
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    @contextmanager
+    def _file_lock(self):
+        """Serializes read-modify-write of the snapshots file across worker processes."""
+        if not self.path or fcntl is None:
+            yield
+            return
+        with open(f"{self.path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load(self, version):
+        snapshots = []
+        if version is not None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    snapshots = json.load(f)
+            except Exception as e:
+                print(f"❌ Error loading snapshots from {self.path}: {e}")
+                return
+        with self._lock:
+            first = not self._loaded
+            if version is None and not first:
+                # The file was deleted or is not configured: keep what this process has
+                self._file_version = version
+                return
+            hits = {snapshot_id: snapshot["hits"] for snapshot_id, snapshot in self._snapshots.items()}
+            self._snapshots = {}
+            self._by_question = {}
+            for snapshot in snapshots:
+                snapshot["hits"] = max(snapshot.get("hits", 0), hits.get(snapshot["id"], 0))
+                self._snapshots[snapshot["id"]] = snapshot
+                self._by_question[_question_key(snapshot["question"])] = snapshot["id"]
+            self._loaded = True
+            self._file_version = version
+        if first and snapshots:
+            print(f"📌 Loaded {len(snapshots)} snapshots from {self.path}")
+
+    def _commit(self, change: Callable[[], None]):
+        """Applies a change on top of the latest file contents and writes them back."""
+        with self._file_lock():
+            self._sync()
+            with self._lock:
+                change()
+                snapshots = list(self._snapshots.values())
+            if not self.path:
+                return
+            try:
+                # Per-process temporary file, so concurrent writers never interleave in one file
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(snapshots, f, default=str)
+                os.replace(tmp_path, self.path)
+                self._file_version = self._version()
+            except Exception as e:
+                print(f"❌ Error saving snapshots to {self.path}: {e}")
+
+
+snapshot_store = SnapshotStore(config.snapshot_path, config.snapshot_max_rows)
@@ -1,10 +1,96 @@
-import pyodbc
-from typing import Any, List, Dict
+from typing import Any, Callable, Iterator, List, Dict, Optional
+import re
+import sqlite3
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import closing, contextmanager, nullcontext
 from src.config import config
+from src.cancellation import TurnCancelled, current_turn
+from src.scheduler import BATCH, INTERACTIVE, current_workload
+from src.recording import recorded_sql
+from src.singleflight import SingleFlight
 
-# Get the connection string from config
-# connection_string = config.sql_connection_string
+# Separate connection budgets so batch work can never take every connection from interactive users.
+# pyodbc's ODBC-level pooling reuses the physical connections inside each budget.
+_sql_partitions = {
+    INTERACTIVE: threading.BoundedSemaphore(config.sql_interactive_pool_size),
+    BATCH: threading.BoundedSemaphore(config.sql_batch_pool_size),
+}
 
+
+@contextmanager
+def _connect():
+    """Opens a connection within the current workload's partition of the connection budget."""
+    partition = _sql_partitions.get(current_workload.get(), _sql_partitions[INTERACTIVE])
+    with partition:
+        if config.sql_standin_path:
+            # Local SQLite stand-in for load tests
+            conn = sqlite3.connect(config.sql_standin_path, check_same_thread=False)
+        else:
+            import pyodbc
+            conn = pyodbc.connect(config.sql_connection_string)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+def _tracked(turn, cursor):
+    """Registers the cursor with the current turn so cancelling the turn cancels the query."""
+    return turn.track(cursor) if turn is not None else nullcontext()
+
+# Concurrent identical read-only queries share one database call
+single_flight = SingleFlight()
+_READ_ONLY_PATTERN = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+
+def _shareable(query: str) -> bool:
+    return config.sql_single_flight_enabled and bool(_READ_ONLY_PATTERN.match(query or ""))
+
+def _flight_key(query: str, params) -> tuple:
+    return re.sub(r"\s+", " ", query or "").strip(), tuple(repr(param) for param in params or ())
+
+def _execute(query: str, params, turn) -> List[Dict[str, Any]]:
+    try:
+        with _connect() as conn:
+            with closing(conn.cursor()) as cursor, _tracked(turn, cursor):
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+                columns = [column[0] for column in cursor.description] if cursor.description else []
+                return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    except TurnCancelled:
+        raise
+    except Exception:
+        # Cancelling the turn cancels the cursor, which surfaces as a driver error
+        if turn is not None and turn.cancelled:
+            raise TurnCancelled(turn.reason)
+        raise
+
+def _wait_for_leader(turn):
+    """Waits for a shared query while still honouring this turn's cancellation and deadline."""
+    def wait(future):
+        while True:
+            try:
+                return future.result(timeout=0.25)
+            except FutureTimeoutError:
+                turn.check()
+    return wait if turn is not None else None
+
+def _shared_query(query: str, params, turn) -> List[Dict[str, Any]]:
+    key = _flight_key(query, params)
+    while True:
+        try:
+            rows = single_flight.do(key, lambda: _execute(query, params, turn), _wait_for_leader(turn))
+        except TurnCancelled:
+            if turn is None or not turn.cancelled:
+                # The turn that was running the shared query was cancelled, not this one; run it again
+                continue
+            raise
+        # Callers own their result, so every caller gets its own copy of the shared rows
+        return [dict(row) for row in rows]
+
+@recorded_sql
 def run_sql_query( query: str, params: tuple = ()) -> List[Dict[str, Any]]:
     """
     Executes a SQL query against a Microsoft SQL Server and returns the results as a list of dictionaries.
@@ -17,22 +103,71 @@ def run_sql_query( query: str, params: tuple = ()) -> List[Dict[str, Any]]:
     Raises:
         Exception: If the query fails.
     """
+    if config.analytics_cache_tables:
+        from src.analyticscache import analytics_cache
+        results = analytics_cache.try_run(query, params)
+        if results is not None:
+            return results
+    turn = current_turn.get()
     try:
-        with pyodbc.connect(connection_string) as conn:
-            with conn.cursor() as cursor:
-                if params:
-                    cursor.execute(query, params)
-                else:
-                    cursor.execute(query)
-                columns = [column[0] for column in cursor.description] if cursor.description else []
-                results = [dict(zip(columns, row)) for row in cursor.fetchall()]
-        return results
+        if _shareable(query):
+            return _shared_query(query, params, turn)
+        return _execute(query, params, turn)
+    except TurnCancelled:
+        raise
     # todo: potentially adjust so that LLM can handle SQL errors and potentially answer them
     except Exception as e:
         print(f"❌ SQL query failed: {e}")
         # Return empty list instead of string to maintain consistent return type
         return [{'error': str(e)}]
 
+def single_flight_stats() -> Dict[str, int]:
+    """Database calls made for shareable queries and calls that were served by another caller's call."""
+    return single_flight.stats()
+
+def iter_sql_query(
+    query: str,
+    params: tuple = (),
+    batch_size: int = 1000,
+    on_description: Optional[Callable[[tuple], None]] = None,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Executes a SQL query and yields the results in batches, keeping at most one batch in memory.
+    Args:
+        query (str): The SQL query to execute.
+        params (tuple): Optional query parameters.
+        batch_size (int): Number of rows fetched per batch.
+        on_description (Optional[Callable[[tuple], None]]): Called with cursor.description once
+            the query has run, before the first batch is yielded. Not called for queries the
+            analytics cache answers.
+    Yields:
+        List[Dict[str, Any]]: The next batch of rows.
+    Raises:
+        Exception: If the query fails.
+    """
+    if config.analytics_cache_tables:
+        from src.analyticscache import analytics_cache
+        results = analytics_cache.try_run(query, params)
+        if results is not None:
+            for start in range(0, len(results), batch_size):
+                yield results[start:start + batch_size]
+            return
+    turn = current_turn.get()
+    with _connect() as conn:
+        with closing(conn.cursor()) as cursor, _tracked(turn, cursor):
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+            columns = [column[0] for column in cursor.description] if cursor.description else []
+            if on_description is not None and cursor.description:
+                on_description(cursor.description)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield [dict(zip(columns, row)) for row in rows]
+
 def get_db_tables() -> List[str]:
     """
     Retrieves a list of all table names in the database.
@@ -78,4 +213,180 @@ def get_db_columns_and_types(schema_name: str, table_name: str) -> List[str]:
             return [f"No columns found for table {schema_name}.{table_name}"]
     except Exception as e:
         print(f"❌ Error in get_db_columns_and_types: {e}")
-        return [f"Error retrieving columns: {str(e)}"]
\ No newline at end of file
+        return [f"Error retrieving columns: {str(e)}"]
+
+# Aggregate functions the model may ask for, mapped to their T-SQL template
+AGGREGATE_FUNCTIONS = {
+    "COUNT": "COUNT_BIG({column})",
+    "COUNT_DISTINCT": "COUNT_BIG(DISTINCT {column})",
+    "APPROX_COUNT_DISTINCT": "APPROX_COUNT_DISTINCT({column})",
+    "SUM": "SUM({column})",
+    "AVG": "AVG(CAST({column} AS FLOAT))",
+    "MIN": "MIN({column})",
+    "MAX": "MAX({column})",
+}
+FILTER_OPERATORS = {"=", "<>", "<", "<=", ">", ">=", "LIKE", "IS NULL", "IS NOT NULL"}
+# Types that cannot be used with MIN/MAX or APPROX_COUNT_DISTINCT
+UNSUMMARIZABLE_TYPES = {
+    "text", "ntext", "image", "xml", "geography", "geometry",
+    "hierarchyid", "sql_variant", "timestamp", "rowversion",
+}
+MAX_SUMMARY_ROWS = 100
+
+def quote_identifier(name: str) -> str:
+    """Quotes a SQL Server identifier, escaping closing brackets."""
+    return "[" + str(name).replace("]", "]]") + "]"
+
+def _table_source(schema_name: str, table_name: str, sample_percent: Optional[float] = None) -> str:
+    source = f"{quote_identifier(schema_name)}.{quote_identifier(table_name)}"
+    if sample_percent:
+        percent = float(sample_percent)
+        if not 0 < percent <= 100:
+            raise ValueError("sample_percent must be between 0 and 100")
+        source += f" TABLESAMPLE ({percent:g} PERCENT)"
+    return source
+
+def describe_table_stats(schema_name: str, table_name: str, sample_percent: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Computes per-column summary statistics for a table in a single server-side scan.
+    Args:
+        schema_name (str): The schema name of the table.
+        table_name (str): The table name.
+        sample_percent (Optional[float]): If set, only scans this percentage of the table's pages.
+    Returns:
+        Dict[str, Any]: The scanned row count and, for every column, its type, non-null count,
+            approximate distinct count and min/max where applicable.
+    """
+    try:
+        columns_query = """
+        SELECT COLUMN_NAME, DATA_TYPE
+        FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE
+        TABLE_SCHEMA = ?
+        AND TABLE_NAME = ?
+        ORDER BY ORDINAL_POSITION
+        """
+        columns = run_sql_query(columns_query, (schema_name, table_name))
+        if not columns or "error" in columns[0]:
+            return {"error": f"No columns found for table {schema_name}.{table_name}"}
+
+        expressions = ["COUNT_BIG(*) AS [row_count]"]
+        for i, column in enumerate(columns):
+            name = quote_identifier(column["COLUMN_NAME"])
+            data_type = column["DATA_TYPE"].lower()
+            if data_type in ("text", "ntext", "image"):
+                continue
+            expressions.append(f"COUNT_BIG({name}) AS [c{i}_non_null]")
+            if data_type in UNSUMMARIZABLE_TYPES:
+                continue
+            expressions.append(f"APPROX_COUNT_DISTINCT({name}) AS [c{i}_distinct]")
+            if data_type != "bit":
+                expressions.append(f"MIN({name}) AS [c{i}_min]")
+                expressions.append(f"MAX({name}) AS [c{i}_max]")
+
+        query = f"SELECT {', '.join(expressions)} FROM {_table_source(schema_name, table_name, sample_percent)}"
+        results = run_sql_query(query)
+        if not results or "error" in results[0]:
+            return results[0] if results else {"error": "Statistics query returned no rows"}
+
+        row = results[0]
+        return {
+            "table": f"[{schema_name}].[{table_name}]",
+            "row_count": row["row_count"],
+            "sample_percent": sample_percent,
+            "columns": [
+                {
+                    "column": column["COLUMN_NAME"],
+                    "type": column["DATA_TYPE"],
+                    "non_null": row.get(f"c{i}_non_null"),
+                    "approx_distinct": row.get(f"c{i}_distinct"),
+                    "min": row.get(f"c{i}_min"),
+                    "max": row.get(f"c{i}_max"),
+                }
+                for i, column in enumerate(columns)
+            ],
+        }
+    except Exception as e:
+        print(f"❌ Error in describe_table_stats: {e}")
+        return {"error": f"Error describing table: {str(e)}"}
+
+def aggregate(
+    schema_name: str,
+    table_name: str,
+    measures: List[Dict[str, str]],
+    group_by: Optional[List[str]] = None,
+    filters: Optional[List[Dict[str, Any]]] = None,
+    limit: int = MAX_SUMMARY_ROWS,
+) -> List[Dict[str, Any]]:
+    """
+    Runs a GROUP BY aggregation on the server and returns only the summary rows.
+    Args:
+        schema_name (str): The schema name of the table.
+        table_name (str): The table name.
+        measures (List[Dict[str, str]]): Items like {"function": "SUM", "column": "Amount"}.
+            Use column "*" with COUNT to count rows.
+        group_by (Optional[List[str]]): Columns to group by.
+        filters (Optional[List[Dict[str, Any]]]): Items like {"column": "Region", "operator": "=", "value": "West"}.
+        limit (int): Maximum number of groups to return, ordered by the first measure descending.
+    Returns:
+        List[Dict[str, Any]]: One row per group.
+    """
+    try:
+        if not measures:
+            raise ValueError("At least one measure is required")
+        group_by = group_by or []
+        params = [max(1, min(int(limit or MAX_SUMMARY_ROWS), MAX_SUMMARY_ROWS))]
+
+        select_list = [quote_identifier(column) for column in group_by]
+        for measure in measures:
+            function = str(measure.get("function", "")).upper()
+            if function not in AGGREGATE_FUNCTIONS:
+                raise ValueError(f"Unsupported aggregate function {function}")
+            column = measure.get("column") or "*"
+            if column == "*" and function != "COUNT":
+                raise ValueError(f"{function} requires a column")
+            column_sql = "*" if column == "*" else quote_identifier(column)
+            alias = quote_identifier(f"{function.lower()}_{'rows' if column == '*' else column}")
+            select_list.append(f"{AGGREGATE_FUNCTIONS[function].format(column=column_sql)} AS {alias}")
+
+        conditions = []
+        for condition in filters or []:
+            operator = str(condition.get("operator", "")).upper()
+            if operator not in FILTER_OPERATORS:
+                raise ValueError(f"Unsupported filter operator {operator}")
+            if operator in ("IS NULL", "IS NOT NULL"):
+                conditions.append(f"{quote_identifier(condition['column'])} {operator}")
+            else:
+                conditions.append(f"{quote_identifier(condition['column'])} {operator} ?")
+                params.append(condition.get("value"))
+
+        query = f"SELECT TOP (?) {', '.join(select_list)} FROM {_table_source(schema_name, table_name)}"
+        if conditions:
+            query += f" WHERE {' AND '.join(conditions)}"
+        if group_by:
+            query += f" GROUP BY {', '.join(quote_identifier(column) for column in group_by)}"
+        query += f" ORDER BY {len(group_by) + 1} DESC"
+        return run_sql_query(query, tuple(params))
+    except Exception as e:
+        print(f"❌ Error in aggregate: {e}")
+        return [{"error": f"Error running aggregate: {str(e)}"}]
+
+def sample_rows(schema_name: str, table_name: str, n: int = 10, sample_percent: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Returns a small sample of rows from a table.
+    Args:
+        schema_name (str): The schema name of the table.
+        table_name (str): The table name.
+        n (int): Number of rows to return (at most 100).
+        sample_percent (Optional[float]): If set, samples from this percentage of the table's pages
+            instead of returning the first rows.
+    Returns:
+        List[Dict[str, Any]]: The sampled rows.
+    """
+    try:
+        n = max(1, min(int(n or 10), MAX_SUMMARY_ROWS))
+        query = f"SELECT TOP (?) * FROM {_table_source(schema_name, table_name, sample_percent)}"
+        return run_sql_query(query, (n,))
+    except Exception as e:
+        print(f"❌ Error in sample_rows: {e}")
+        return [{"error": f"Error sampling rows: {str(e)}"}]
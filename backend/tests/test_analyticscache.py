@@ -0,0 +1,64 @@
+import pytest
+
+pytest.importorskip("duckdb")
+pytest.importorskip("sqlglot")
+pytest.importorskip("pyarrow")
+
+from src.analyticscache import AnalyticsCache, _translate
+
+TABLES = frozenset({("sales", "orders")})
+
+
+def make_cache(path):
+    cache = AnalyticsCache(["Sales.Orders"], str(path), refresh_seconds=3600, batch_size=100)
+    # Keep the test offline: no background refresh from SQL Server
+    cache._refresh_loop = lambda: None
+    return cache
+
+
+def test_like_is_translated_case_insensitive():
+    translated = _translate("SELECT * FROM Sales.Orders WHERE Region LIKE 'we%'", TABLES)
+    assert "ILIKE" in translated
+
+
+def test_collation_dependent_string_functions_are_not_eligible():
+    assert _translate("SELECT CHARINDEX('w', Region) FROM Sales.Orders", TABLES) is None
+    assert _translate("SELECT REPLACE(Region, 'W', 'X') FROM Sales.Orders", TABLES) is None
+    assert _translate("SELECT Region FROM Sales.Orders", TABLES) is not None
+
+
+def test_string_comparisons_ignore_case_like_sql_server(tmp_path):
+    cache = make_cache(tmp_path / "cache.duckdb")
+    cache.start()
+    cursor = cache._conn.cursor()
+    cursor.execute('CREATE SCHEMA "Sales"')
+    cursor.execute('CREATE TABLE "Sales"."Orders" AS SELECT * FROM (VALUES (\'West\', 1), (\'west\', 2), (\'East\', 3)) t(Region, Amount)')
+    cache._mark_loaded("Sales", "Orders")
+
+    assert cache.try_run("SELECT SUM(Amount) AS Total FROM Sales.Orders WHERE Region = 'WEST'") == [{"Total": 3}]
+    assert cache.try_run("SELECT COUNT(*) AS n FROM Sales.Orders WHERE Region LIKE 'WE%'") == [{"n": 2}]
+
+
+def test_integer_division_and_avg_match_sql_server(tmp_path):
+    cache = make_cache(tmp_path / "cache.duckdb")
+    cache.start()
+    cursor = cache._conn.cursor()
+    cursor.execute('CREATE SCHEMA "Sales"')
+    cursor.execute('CREATE TABLE "Sales"."Orders" AS SELECT * FROM (VALUES (3, 1.5), (4, 2.0)) t(Qty, Price)')
+    cache._mark_loaded("Sales", "Orders")
+
+    # SQL Server: int / int truncates and AVG of an int column is an int
+    assert cache.try_run("SELECT SUM(Qty)/COUNT(*) AS a, 7/2 AS b, AVG(Qty) AS c FROM Sales.Orders") == [
+        {"a": 3, "b": 3, "c": 3}
+    ]
+    assert cache.try_run("SELECT SUM(Price)/2 AS d FROM Sales.Orders")[0]["d"] == pytest.approx(1.75)
+    # Operand types that cannot be inferred send the query to SQL Server
+    assert _translate("SELECT Qty/2 FROM Sales.Orders", TABLES) is None
+
+
+def test_unopenable_store_disables_the_cache(tmp_path):
+    # A directory cannot be opened as a DuckDB file, like a file locked by another worker
+    cache = make_cache(tmp_path)
+    assert cache.try_run("SELECT Region FROM Sales.Orders") is None
+    assert not cache.available
+    assert cache.try_run("SELECT Region FROM Sales.Orders") is None
@@ -0,0 +1,54 @@
+from src.answers import (
+    COMPLEX,
+    SIMPLE,
+    direct_answer,
+    is_exploratory_query,
+    max_iterations_for,
+    question_complexity,
+)
+
+QUESTION = "What is our best-selling product?"
+
+
+def test_question_complexity():
+    assert question_complexity(QUESTION) == SIMPLE
+    assert question_complexity("Compare sales by region and explain why the trend changed") == COMPLEX
+
+
+def test_simple_questions_get_room_for_discovery():
+    # tables -> columns -> query -> answer
+    assert max_iterations_for(QUESTION) >= 4
+
+
+def test_exploratory_queries():
+    assert is_exploratory_query("SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME LIKE '%Product%'")
+    assert is_exploratory_query("select top 5 * from SalesLT.Product")
+    assert is_exploratory_query("SELECT TOP (10) * FROM SalesLT.Product")
+    assert is_exploratory_query("SELECT name FROM sys.tables")
+    assert is_exploratory_query("SELECT DISTINCT Region FROM Sales")
+    assert is_exploratory_query("SELECT TOP 10 Name, ListPrice FROM SalesLT.Product")
+    assert not is_exploratory_query("SELECT TOP 1 Name, SUM(Qty) AS Units FROM Sales GROUP BY Name ORDER BY Units DESC")
+
+
+def test_schema_probe_is_not_an_answer():
+    rows = [{"TABLE_NAME": "Product"}, {"TABLE_NAME": "ProductCategory"}]
+    args = {"query": "SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME LIKE '%Product%'"}
+    assert direct_answer(QUESTION, "run_sql_query", args, rows) is None
+
+
+def test_data_probe_is_not_an_answer():
+    rows = [{"Color": "Red"}, {"Color": "Black"}]
+    assert direct_answer(QUESTION, "run_sql_query", {"query": "SELECT DISTINCT Color FROM SalesLT.Product"}, rows) is None
+    assert direct_answer(QUESTION, "run_sql_query", {"query": "SELECT TOP 2 Color FROM SalesLT.Product"}, rows) is None
+
+
+def test_small_final_result_is_answered_directly():
+    rows = [{"Name": "Road Bike", "Units": 42}]
+    args = {"query": "SELECT TOP 1 Name, SUM(Qty) AS Units FROM Sales GROUP BY Name ORDER BY Units DESC"}
+    assert direct_answer(QUESTION, "run_sql_query", args, rows) == "Name | Units\nRoad Bike | 42"
+
+
+def test_errors_and_other_tools_are_not_answered_directly():
+    args = {"query": "SELECT COUNT(*) AS Orders FROM Sales"}
+    assert direct_answer(QUESTION, "run_sql_query", args, [{"error": "Invalid object name"}]) is None
+    assert direct_answer(QUESTION, "get_db_tables", {}, ["[SalesLT].[Product]"]) is None
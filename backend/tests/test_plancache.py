@@ -0,0 +1,79 @@
+from src.plancache import PlanCache, is_sql_error, normalize_question
+
+QUERY = "SELECT SUM(TotalDue) AS Total FROM SalesLT.SalesOrderHeader WHERE Region = ?"
+
+
+def test_normalize_question():
+    assert normalize_question("  What were   total sales?? ") == "What were total sales"
+
+
+def test_is_sql_error():
+    assert is_sql_error([{"error": "Invalid column"}])
+    assert is_sql_error("[{'error': 'Invalid column'}]")
+    assert is_sql_error('{"error": "timeout"}')
+    assert not is_sql_error([{"Total": 1}])
+
+
+def test_build_template_turns_literals_into_slots():
+    template = PlanCache().build_template("What were total sales for region West?", QUERY, ["West"])
+    assert template["segments"] == ["What were total sales for region ", 0]
+    assert template["params"] == [{"slot": 0}]
+
+
+def test_build_template_keeps_params_missing_from_question():
+    template = PlanCache().build_template("What were total sales last year?", QUERY, ["West"])
+    assert template["segments"] == ["What were total sales last year"]
+    assert template["params"] == [{"value": "West"}]
+
+
+def test_build_template_rejects_writes():
+    assert PlanCache().build_template("Delete region West", "DELETE FROM Region WHERE Name = ?", ["West"]) is None
+
+
+def test_lookup_binds_new_values():
+    cache = PlanCache()
+    cache.record("What were total sales for region West", QUERY, ["West"])
+    assert cache.lookup("what were total sales for region East?") == (QUERY, ("East",))
+
+
+def test_lookup_misses_when_extra_text_follows_a_slot():
+    cache = PlanCache()
+    cache.record("What were total sales for region West", QUERY, ["West"])
+    assert cache.lookup("What were total sales for region East excluding returns last year?") is None
+
+
+def test_multi_word_and_numeric_slots_keep_their_shape():
+    cache = PlanCache()
+    query = "SELECT COUNT(*) FROM Orders WHERE City = ? AND OrderYear = ?"
+    cache.record("How many orders from New York in 2023", query, ["New York", "2023"])
+    assert cache.lookup("How many orders from San Diego in 2024") == (query, ("San Diego", "2024"))
+    assert cache.lookup("How many orders from Boston in 2024") is None
+    assert cache.lookup("How many orders from San Diego in last year") is None
+
+
+def test_templates_persist(tmp_path):
+    path = str(tmp_path / "plans.json")
+    PlanCache(path).record("What were total sales for region West", QUERY, ["West"])
+    assert PlanCache(path).lookup("What were total sales for region North") == (QUERY, ("North",))
+
+
+def test_follow_up_turns_neither_hit_nor_teach_the_cache(monkeypatch):
+    from src import conversation as conversation_module
+
+    cache = PlanCache()
+    cache.record("What were total sales for region West", QUERY, ["West"])
+    monkeypatch.setattr(conversation_module, "plan_cache", cache)
+    monkeypatch.setattr(conversation_module, "run_sql_query", lambda query, params=(): [{"Total": 1}])
+    conversation = conversation_module.Conversation("test")
+
+    conversation.messages.append({"role": "user", "content": "What were total sales for region East?"})
+    assert conversation.answer_from_plan_cache("What were total sales for region East?", None) is not None
+
+    # A follow-up may lean on the earlier turn, so the same wording must go to the model
+    conversation.messages.append({"role": "assistant", "content": "Total: 1"})
+    conversation.messages.append({"role": "user", "content": "What were total sales for region North?"})
+    assert conversation.answer_from_plan_cache("What were total sales for region North?", None) is None
+
+    conversation.last_turn_queries = [{"query": "SELECT 2 WHERE Year = ?", "params": [2023], "ok": True}]
+    conversation.remember_plan("And for 2023?")
+    assert cache.lookup("And for 2023?") is None
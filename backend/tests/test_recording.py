@@ -0,0 +1,19 @@
+import pytest
+
+from src.recording import RECORD, REPLAY, Recorder
+
+
+def test_replay_refuses_calls_that_were_not_recorded(tmp_path):
+    path = str(tmp_path / "recording.jsonl.gz")
+    recording = Recorder(RECORD, path)
+    recording.sql_call(lambda: [{"Total": 42}], "SELECT SUM(Amount) AS Total FROM Sales", ())
+    recording.sql_call(lambda: [{"n": 7}], "SELECT COUNT(*) AS n FROM Sales", ())
+    recording._file.close()
+
+    replay = Recorder(REPLAY, path, latency_scale=0)
+    assert replay.sql_call(None, "SELECT  COUNT(*) AS n FROM Sales", ()) == [{"n": 7}]
+    with pytest.raises(LookupError):
+        replay.sql_call(None, "SELECT COUNT(*) AS n FROM Orders", ())
+    # Each recorded call is served once
+    with pytest.raises(LookupError):
+        replay.sql_call(None, "SELECT COUNT(*) AS n FROM Sales", ())
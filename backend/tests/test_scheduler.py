@@ -0,0 +1,121 @@
+import threading
+import time
+
+import pytest
+
+from src.scheduler import BATCH, INTERACTIVE, AdmissionRejected, TurnScheduler, current_workload
+
+
+def make_scheduler(**overrides):
+    settings = dict(max_concurrent=2, max_per_user=1, max_per_tenant=2, max_queue=4, max_wait_seconds=2.0)
+    settings.update(overrides)
+    return TurnScheduler(**settings)
+
+
+def acquire_in_thread(scheduler, user, tenant, admitted, flow=None):
+    """Acquires a slot on a background thread, appending the waiter to admitted once it runs."""
+    def run():
+        try:
+            admitted.append(scheduler.acquire(user, tenant, flow))
+        except AdmissionRejected as e:
+            admitted.append(e)
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.01)
+
+
+def test_admit_sets_workload_and_releases_slot():
+    scheduler = make_scheduler()
+    with scheduler.admit("alice", "sales", BATCH):
+        assert current_workload.get() == BATCH
+        assert scheduler.stats()["running"] == 1
+    assert current_workload.get() == INTERACTIVE
+    assert scheduler.stats()["running"] == 0
+
+
+def test_per_user_limit_queues_until_release():
+    scheduler = make_scheduler()
+    first = scheduler.acquire("alice", "sales")
+    admitted = []
+    thread = acquire_in_thread(scheduler, "alice", "sales", admitted)
+    wait_for(lambda: scheduler.stats()["queued"] == 1)
+    assert admitted == []
+
+    scheduler.release(first)
+    thread.join(2)
+    assert len(admitted) == 1 and not isinstance(admitted[0], AdmissionRejected)
+    scheduler.release(admitted[0])
+
+
+def test_callers_without_identity_share_one_user_limit():
+    scheduler = make_scheduler(max_concurrent=3, max_per_user=2)
+    waiters = [scheduler.acquire(None, None, flow) for flow in ("c1", "c2")]
+    admitted = []
+    thread = acquire_in_thread(scheduler, None, None, admitted, "c3")
+    wait_for(lambda: scheduler.stats()["queued"] == 1)
+    assert scheduler.stats()["running"] == 2
+
+    scheduler.release(waiters[0])
+    thread.join(2)
+    scheduler.release(waiters[1])
+    scheduler.release(admitted[0])
+
+
+def test_full_queue_is_rejected_with_retry_after():
+    scheduler = make_scheduler(max_concurrent=1, max_queue=1)
+    running = scheduler.acquire("alice", None)
+    admitted = []
+    thread = acquire_in_thread(scheduler, "bob", None, admitted)
+    wait_for(lambda: scheduler.stats()["queued"] == 1)
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        scheduler.acquire("carol", None)
+    assert rejected.value.retry_after >= 1
+    assert scheduler.stats()["rejected"] == 1
+
+    scheduler.release(running)
+    thread.join(2)
+    scheduler.release(admitted[0])
+
+
+def test_waiting_too_long_is_rejected():
+    scheduler = make_scheduler(max_concurrent=1, max_wait_seconds=0.1)
+    running = scheduler.acquire("alice", None)
+    with pytest.raises(AdmissionRejected):
+        scheduler.acquire("bob", None)
+    # The abandoned waiter leaves the queue, so it neither counts against max_queue nor takes the freed slot
+    assert scheduler.stats()["queued"] == 0
+    scheduler.release(running)
+    assert scheduler.stats()["running"] == 0
+    scheduler.release(scheduler.acquire("carol", None))
+
+
+def test_fair_queuing_admits_other_users_before_a_backlog():
+    scheduler = make_scheduler(max_concurrent=1, max_per_user=1, max_queue=10)
+    running = scheduler.acquire("alice", None)
+    admitted = []
+    threads = [acquire_in_thread(scheduler, "alice", None, admitted) for _ in range(3)]
+    wait_for(lambda: scheduler.stats()["queued"] == 3)
+    threads.append(acquire_in_thread(scheduler, "bob", None, admitted))
+    wait_for(lambda: scheduler.stats()["queued"] == 4)
+
+    scheduler.release(running)
+    wait_for(lambda: len(admitted) == 1)
+    # Bob's first turn finishes earlier in virtual time than Alice's second and third queued turns
+    order = [admitted[0].user]
+    while len(order) < 4:
+        scheduler.release(admitted[len(order) - 1])
+        wait_for(lambda: len(admitted) == len(order) + 1)
+        order.append(admitted[-1].user)
+    scheduler.release(admitted[-1])
+    for thread in threads:
+        thread.join(2)
+    assert order[0] == "bob"
@@ -0,0 +1,88 @@
+import threading
+import time
+
+import pytest
+
+from src import schemaindex
+from src.cancellation import TurnCancelled
+from src.schemaindex import SchemaIndex
+
+
+def metadata_rows(table_name):
+    return [
+        {"TABLE_SCHEMA": "Sales", "TABLE_NAME": table_name, "COLUMN_NAME": "Region", "DATA_TYPE": "int"},
+        {"TABLE_SCHEMA": "Sales", "TABLE_NAME": table_name, "COLUMN_NAME": "Amount", "DATA_TYPE": "money"},
+    ]
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_first_search_does_not_wait_for_the_build(monkeypatch):
+    release = threading.Event()
+
+    def slow_query(query, params=()):
+        release.wait(5)
+        return metadata_rows("Orders")
+
+    monkeypatch.setattr(schemaindex, "run_sql_query", slow_query)
+    index = SchemaIndex(ttl_seconds=3600, sample_values=0)
+
+    assert index.search("orders by region") is None
+    release.set()
+    wait_until(lambda: index.search("orders by region"))
+    assert index.search("orders by region")[0][0].name == "[Sales].[Orders]"
+
+
+def test_stale_index_is_served_while_it_rebuilds(monkeypatch):
+    tables = iter(["Orders", "Invoices"])
+    release = threading.Event()
+    release.set()
+
+    def query(query, params=()):
+        release.wait(5)
+        return metadata_rows(next(tables))
+
+    monkeypatch.setattr(schemaindex, "run_sql_query", query)
+    index = SchemaIndex(ttl_seconds=0, sample_values=0)
+    index.search("orders")
+    wait_until(lambda: index.search("orders"))
+
+    # The TTL has passed: the rebuild starts in the background and the old index answers meanwhile
+    release.clear()
+    assert index.search("orders")[0][0].name == "[Sales].[Orders]"
+    release.set()
+    wait_until(lambda: index.search("invoices"))
+
+
+def test_failed_build_is_not_retried_on_every_search(monkeypatch):
+    calls = []
+
+    def failing_query(query, params=()):
+        calls.append(query)
+        return [{"error": "login failed"}]
+
+    monkeypatch.setattr(schemaindex, "run_sql_query", failing_query)
+    index = SchemaIndex(ttl_seconds=3600, sample_values=0)
+    index.search("orders")
+    wait_until(lambda: not index._building)
+    index.search("orders")
+    assert len(calls) == 1
+
+
+def test_find_relevant_tables_lets_turn_cancellation_through(monkeypatch):
+    def cancelled(question, k):
+        raise TurnCancelled("deadline")
+
+    monkeypatch.setattr(schemaindex.schema_index, "search", cancelled)
+    with pytest.raises(TurnCancelled):
+        schemaindex.find_relevant_tables("orders")
+
+
+def test_fallback_names_the_backend_column_tool(monkeypatch):
+    monkeypatch.setattr(schemaindex.schema_index, "search", lambda question, k: None)
+    assert "get_db_columns_and_types" in schemaindex.find_relevant_tables("orders")[0]
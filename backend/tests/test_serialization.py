@@ -0,0 +1,43 @@
+import datetime
+import decimal
+import json
+
+import pytest
+
+pytest.importorskip("flask")
+
+from src.serialization import arrow_stream, dumps_bytes
+
+
+def read_arrow(chunks):
+    pa = pytest.importorskip("pyarrow")
+    return pa.ipc.open_stream(b"".join(chunks)).read_all()
+
+
+def test_decimals_keep_their_precision():
+    row = {"Amount": decimal.Decimal("12345678901234567.89"), "At": datetime.date(2024, 1, 31)}
+    assert json.loads(dumps_bytes(row)) == {"Amount": "12345678901234567.89", "At": "2024-01-31"}
+
+
+def test_arrow_schema_comes_from_the_cursor_description():
+    pytest.importorskip("pyarrow")
+    # pyodbc-style description: name, type_code, display_size, internal_size, precision, scale, null_ok
+    description = [
+        ("Region", str, None, 50, 50, 0, True),
+        ("Discount", decimal.Decimal, None, 10, 10, 2, True),
+    ]
+    batches = [
+        [{"Region": "West", "Discount": None}],
+        [{"Region": "East", "Discount": decimal.Decimal("0.15")}],
+    ]
+    table = read_arrow(arrow_stream(batches, description))
+    assert str(table.schema.field("Discount").type) == "decimal128(10, 2)"
+    assert table.column("Discount").to_pylist() == [None, decimal.Decimal("0.15")]
+
+
+def test_arrow_without_types_survives_an_all_null_first_batch():
+    pytest.importorskip("pyarrow")
+    description = [("Name", None, None, None, None, None, None)]
+    batches = [[{"Name": None}], [{"Name": "Widget"}]]
+    table = read_arrow(arrow_stream(batches, description))
+    assert table.column("Name").to_pylist() == [None, "Widget"]
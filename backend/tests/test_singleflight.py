@@ -0,0 +1,68 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def call():
+        calls.append(1)
+        release.wait(5)
+        return ["row"]
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("q", call))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == [1]
+    assert results == [["row"]] * 4
+    assert flight.stats() == {"in_flight": 0, "executed": 1, "collapsed": 3}
+
+
+def test_errors_are_shared_and_nothing_is_cached():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        flight.do("q", fail)
+    assert flight.do("q", lambda: 1) == 1
+    assert flight.stats()["executed"] == 2
+
+
+def test_cancelled_async_follower_does_not_cancel_the_shared_call():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def call():
+        release.wait(5)
+        return 42
+
+    async def scenario():
+        leader = asyncio.create_task(flight.do_async("q", call))
+        await asyncio.sleep(0.05)
+        cancelled = asyncio.create_task(flight.do_async("q", call))
+        follower = asyncio.create_task(flight.do_async("q", call))
+        await asyncio.sleep(0.05)
+        cancelled.cancel()
+        await asyncio.sleep(0.05)
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        return await leader, await follower
+
+    assert asyncio.run(scenario()) == (42, 42)
+    assert flight.stats()["collapsed"] == 2
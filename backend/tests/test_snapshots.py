@@ -0,0 +1,53 @@
+import pytest
+
+from src import snapshots
+from src.snapshots import SnapshotStore
+
+
+@pytest.fixture(autouse=True)
+def fake_sql(monkeypatch):
+    monkeypatch.setattr(snapshots, "run_sql_query", lambda query, params=(): [{"Total": 42}])
+
+
+def test_store_does_no_work_until_first_used(tmp_path):
+    path = tmp_path / "snapshots.json"
+    path.write_text("[]")
+    store = SnapshotStore(str(path))
+    assert not store._loaded
+    assert store._thread is None
+
+    assert store.list() == []
+    assert store._loaded
+    # No snapshots yet, so still no refresh thread
+    assert store._thread is None
+
+
+def test_worker_processes_see_each_others_changes(tmp_path):
+    path = str(tmp_path / "snapshots.json")
+    first, second = SnapshotStore(path), SnapshotStore(path)
+
+    pinned = first.pin("Total sales?", "SELECT SUM(Amount) AS Total FROM Sales", [], 3600)
+    assert second.lookup("total sales")["result"] == [{"Total": 42}]
+
+    # A pin made elsewhere is kept when this store writes its own change
+    second.pin("Order count?", "SELECT COUNT(*) AS Total FROM Orders", [], 3600)
+    assert {snapshot["question"] for snapshot in first.list()} == {"Total sales", "Order count"}
+
+    assert second.remove(pinned["id"])
+    assert [snapshot["question"] for snapshot in first.list()] == ["Order count"]
+
+
+def test_only_one_process_refreshes(tmp_path):
+    if snapshots.fcntl is None:
+        pytest.skip("file locks are not available on this platform")
+    path = str(tmp_path / "snapshots.json")
+    first, second = SnapshotStore(path), SnapshotStore(path)
+    assert first._is_refresher()
+    assert not second._is_refresher()
+
+
+def test_store_without_a_path_keeps_snapshots_in_memory():
+    store = SnapshotStore(None)
+    store.pin("Total sales?", "SELECT SUM(Amount) AS Total FROM Sales", [], 3600)
+    assert store.lookup("total sales")["result"] == [{"Total": 42}]
+    assert len(store.list()) == 1
@@ -0,0 +1,92 @@
+"""
+Startup benchmark for the backend and MCP server entry points.
+
+Each run starts a fresh interpreter with `python -X importtime`, imports the entry
+module (which is what every worker or serverless instance pays on cold start) and
+reports the wall-clock time plus the slowest imports.
+
+Usage:
+    python bench_startup.py --runs 5
+    python bench_startup.py --target backend --top 20
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+TARGETS = {
+    "backend": (os.path.join(ROOT, "backend"), "import main"),
+    "mcpserver": (os.path.join(ROOT, "mcpserver"), "import server"),
+}
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)")
+
+
+def run_once(cwd, statement):
+    """Imports the entry module in a fresh interpreter and returns wall time and per-module import times."""
+    started = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+    )
+    elapsed = time.perf_counter() - started
+    imports = []
+    for line in process.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            imports.append((module, int(self_us), int(cumulative_us), len(indent)))
+    if process.returncode != 0:
+        errors = [line for line in process.stderr.splitlines() if not IMPORTTIME_LINE.match(line)]
+        raise RuntimeError(errors[-1] if errors else f"exit code {process.returncode}")
+    return elapsed, imports
+
+
+def benchmark(name, runs, top):
+    cwd, statement = TARGETS[name]
+    print(f"⏱️  {name}: {statement} ({runs} runs)")
+    wall_times = []
+    imports = []
+    for _ in range(runs):
+        elapsed, imports = run_once(cwd, statement)
+        wall_times.append(elapsed)
+
+    print(f"   Wall time: median {statistics.median(wall_times) * 1000:.0f} ms, "
+          f"min {min(wall_times) * 1000:.0f} ms, max {max(wall_times) * 1000:.0f} ms")
+
+    # importtime reports a module when it finishes loading, so the entry module comes last
+    entry = imports[-1] if imports else None
+    if entry:
+        print(f"   Import time of {entry[0]}: {entry[2] / 1000:.0f} ms cumulative")
+    slowest = sorted(imports, key=lambda item: item[2], reverse=True)
+    print(f"   Slowest imports (cumulative, last run):")
+    for module, self_us, cumulative_us, _ in slowest[1:top + 1]:
+        print(f"     {cumulative_us / 1000:8.1f} ms  {module} (self {self_us / 1000:.1f} ms)")
+    return statistics.median(wall_times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start import time of the server entry points.")
+    parser.add_argument("--target", choices=sorted(TARGETS), action="append", help="Entry point(s) to measure")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per target")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest imports to list")
+    args = parser.parse_args()
+
+    failed = False
+    for name in args.target or sorted(TARGETS):
+        try:
+            benchmark(name, args.runs, args.top)
+        except RuntimeError as e:
+            print(f"❌ {name} failed to import: {e}")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
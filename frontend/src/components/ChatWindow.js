@@ -10,6 +10,7 @@ const ChatWindow = () => {
   const [error, setError] = useState(null);
   const [connectionStatus, setConnectionStatus] = useState('connecting');
   const messagesEndRef = useRef(null);
+  const pendingRequestRef = useRef(null);
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
@@ -23,6 +24,16 @@ const ChatWindow = () => {
     initializeChat();
   }, []);
 
+  // Cancel an in-flight message when the user navigates away so the backend stops working on it
+  useEffect(() => {
+    const cancelPending = () => pendingRequestRef.current?.abort();
+    window.addEventListener('beforeunload', cancelPending);
+    return () => {
+      window.removeEventListener('beforeunload', cancelPending);
+      cancelPending();
+    };
+  }, []);
+
   const initializeChat = async () => {
     try {
       setConnectionStatus('connecting');
@@ -52,13 +63,18 @@ const ChatWindow = () => {
     setIsLoading(true);
     setError(null);
 
+    const controller = new AbortController();
+    pendingRequestRef.current = controller;
     try {
-      const updatedConversation = await ApiService.sendMessage(conversation.conversation_id, messageText);
+      const updatedConversation = await ApiService.sendMessage(conversation.conversation_id, messageText, {
+        signal: controller.signal,
+      });
       setMessages(updatedConversation.messages || []);
     } catch (err) {
       console.error('Failed to send message:', err);
       setError('Failed to send message. Please try again.');
     } finally {
+      pendingRequestRef.current = null;
       setIsLoading(false);
     }
   };
@@ -11,6 +11,9 @@ const config = {
   // Retry attempts for failed requests
   API_RETRY_ATTEMPTS: process.env.REACT_APP_API_RETRY_ATTEMPTS || 3,
   
+  // Optional tenant sent as X-Tenant-Id for the backend's per-tenant limits
+  TENANT_ID: process.env.REACT_APP_TENANT_ID || '',
+  
   // Development mode flag
   IS_DEVELOPMENT: process.env.NODE_ENV === 'development',
 };
@@ -1,6 +1,30 @@
 import axios from 'axios';
 import config from '../config/api.config';
 
+// Stable per-browser identity so the backend can apply per-user limits and fair queuing
+const USER_ID_KEY = 'nl2sql-user-id';
+
+function getUserId() {
+  try {
+    let userId = window.localStorage.getItem(USER_ID_KEY);
+    if (!userId) {
+      userId = window.crypto?.randomUUID?.() || `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+      window.localStorage.setItem(USER_ID_KEY, userId);
+    }
+    return userId;
+  } catch (error) {
+    return null;
+  }
+}
+
+function identityHeaders() {
+  const headers = {};
+  const userId = getUserId();
+  if (userId) headers['X-User-Id'] = userId;
+  if (config.TENANT_ID) headers['X-Tenant-Id'] = config.TENANT_ID;
+  return headers;
+}
+
 class ApiService {
   constructor() {
     this.client = axios.create({
@@ -8,6 +32,7 @@ class ApiService {
       timeout: config.API_TIMEOUT,
       headers: {
         'Content-Type': 'application/json',
+        ...identityHeaders(),
       },
     });
     
@@ -53,19 +78,35 @@ class ApiService {
     }
   }
 
-  // Send a message to a conversation
-  async sendMessage(conversationId, message) {
+  // Send a message to a conversation. The backend stops working on the turn once our
+  // timeout has passed; if the request fails or is aborted we also cancel it explicitly.
+  async sendMessage(conversationId, message, { signal } = {}) {
     try {
       const response = await this.client.post(`/conversation/${conversationId}`, {
         message: message
+      }, {
+        signal: signal,
+        headers: { 'X-Turn-Deadline-Ms': String(config.API_TIMEOUT) },
       });
       return response.data.conversation;
     } catch (error) {
       console.error('Failed to send message:', error);
+      if (error.code === 'ECONNABORTED' || axios.isCancel(error)) {
+        this.cancelTurn(conversationId);
+      }
       throw error;
     }
   }
 
+  // Cancel the message currently being processed in a conversation
+  cancelTurn(conversationId) {
+    // keepalive lets the request outlive the page when the user navigates away
+    return fetch(`${config.API_BASE_URL}/conversation/${conversationId}/turn`, {
+      method: 'DELETE',
+      keepalive: true,
+    }).catch(error => console.error('Failed to cancel turn:', error));
+  }
+
   // Run a direct SQL query
   async runSqlQuery(query, params = []) {
     try {
@@ -79,6 +120,45 @@ class ApiService {
       throw error;
     }
   }
+
+  // Stream a direct SQL query as NDJSON, calling onRows with each parsed batch of rows
+  // so large result sets never have to be held in memory as one JSON document
+  async streamSqlQuery(query, params = [], onRows) {
+    const response = await fetch(`${config.API_BASE_URL}/sql/query`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'Accept': 'application/x-ndjson',
+        ...identityHeaders(),
+      },
+      body: JSON.stringify({ query: query, params: params }),
+    });
+    if (!response.ok) {
+      const data = await response.json().catch(() => ({}));
+      throw new Error(data.error || `SQL query failed with status ${response.status}`);
+    }
+
+    const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+    let buffer = '';
+    let rowCount = 0;
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += value;
+      const lines = buffer.split('\n');
+      buffer = lines.pop();
+      const rows = lines.filter(line => line.trim()).map(line => JSON.parse(line));
+      if (rows.length) {
+        rowCount += rows.length;
+        onRows(rows);
+      }
+    }
+    if (buffer.trim()) {
+      rowCount += 1;
+      onRows([JSON.parse(buffer)]);
+    }
+    return rowCount;
+  }
 }
 
 export default new ApiService(); 
\ No newline at end of file
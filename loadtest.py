@@ -0,0 +1,307 @@
+"""
+Load generator replaying synthetic frontend conversations against backend/main.py.
+
+Each virtual user behaves like the React app in its own browser: ApiService.createConversation
+(POST /conversation) followed by a few sendMessage calls (POST /conversation/<id> with
+X-Turn-Deadline-Ms), with think time between messages. By default every request carries the
+frontend's identity headers: one X-User-Id per browser and no X-Tenant-Id unless --tenant is
+given, like REACT_APP_TENANT_ID. --identity none sends no identity (older clients, scripts), and
+--identity tenants spreads the users over --tenants tenants to exercise per-tenant fair queuing.
+
+Conversation lengths follow a shape distribution. The number of users is ramped up stage by
+stage until the server saturates (error rate or p95 latency past the limits), for each serving
+configuration.
+
+The backend is started with the stubbed LLM (LLM_STUB_ENABLED) and a seeded SQLite stand-in
+(SQL_STANDIN_PATH), so no Azure resources are used:
+
+    python loadtest.py --server flask-threaded --server gunicorn-gthread --threads 16
+    python loadtest.py --server gunicorn-gevent --users 8,16,32,64,128 --stage-seconds 60
+    python loadtest.py --url http://localhost:4000   # an already running backend
+    python loadtest.py --identity tenants --tenants 4 --env SCHEDULER_MAX_CONCURRENT_PER_TENANT=2
+
+Requires httpx; the gunicorn configurations also need `pip install gunicorn` (and gevent).
+Conversations live in process memory, so every configuration runs a single worker process.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import httpx
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BACKEND = os.path.join(ROOT, "backend")
+
+# Serving configurations; {port} and {threads} are filled in from the command line
+SERVERS = {
+    "flask-threaded": [sys.executable, "-c", "from main import app; app.run(port={port}, threaded=True)"],
+    "gunicorn-gthread": ["gunicorn", "-w", "1", "-k", "gthread", "--threads", "{threads}", "-b", "127.0.0.1:{port}", "main:app"],
+    "gunicorn-gevent": ["gunicorn", "-w", "1", "-k", "gevent", "--worker-connections", "1000", "-b", "127.0.0.1:{port}", "main:app"],
+}
+
+# Conversation-shape distribution: share of conversations and their number of messages
+DEFAULT_SHAPES = [
+    {"name": "quick lookup", "weight": 0.5, "min_turns": 1, "max_turns": 2},
+    {"name": "exploration", "weight": 0.35, "min_turns": 3, "max_turns": 5},
+    {"name": "deep dive", "weight": 0.15, "min_turns": 6, "max_turns": 10},
+]
+QUESTIONS = [
+    "How many orders do we have?",
+    "What are total sales by region?",
+    "Which product categories sell the most units?",
+    "What are our ten most expensive products?",
+    "Who are our top customers by revenue?",
+    "Show me the latest orders",
+    "Compare sales between the West and East regions and explain the difference",
+    "How did revenue change over time, and which categories drove the growth?",
+]
+TURN_DEADLINE_MS = 30000  # the frontend's default API_TIMEOUT
+IDENTITIES = ("frontend", "none", "tenants")
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class Stage:
+    """Results of running a fixed number of virtual users for one stage."""
+
+    def __init__(self, users):
+        self.users = users
+        self.latencies = []
+        self.errors = {}
+
+    def error(self, kind):
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def summary(self, seconds):
+        failed = sum(self.errors.values())
+        total = len(self.latencies) + failed
+        return {
+            "users": self.users,
+            "turns": len(self.latencies),
+            "turns_per_second": round(len(self.latencies) / seconds, 2),
+            "p50_seconds": round(statistics.median(self.latencies), 3) if self.latencies else None,
+            "p95_seconds": round(percentile(self.latencies, 0.95), 3) if self.latencies else None,
+            "error_rate": round(failed / total, 4) if total else 0.0,
+            "errors": self.errors,
+        }
+
+
+def identity_headers(args, index, rng):
+    """The identity headers one simulated browser sends with every request (see frontend/src/services/api.js)."""
+    if args.identity == "none":
+        return {}
+    # The frontend keeps one random id per browser in localStorage
+    headers = {"X-User-Id": str(uuid.UUID(int=rng.getrandbits(128), version=4))}
+    if args.identity == "tenants":
+        headers["X-Tenant-Id"] = f"loadtest-tenant-{index % args.tenants}"
+    elif args.tenant:
+        headers["X-Tenant-Id"] = args.tenant
+    return headers
+
+
+async def virtual_user(client, index, args, shapes, stage, rng):
+    """Runs conversations like one frontend user until cancelled."""
+    headers = identity_headers(args, index, rng)
+    message_headers = dict(headers, **{"X-Turn-Deadline-Ms": str(TURN_DEADLINE_MS)})
+    think_time = args.think_time
+    while True:
+        shape = rng.choices(shapes, weights=[shape["weight"] for shape in shapes])[0]
+        try:
+            response = await client.post("/conversation", headers=headers)
+            if response.status_code != 200:
+                stage.error(f"create {response.status_code}")
+                await asyncio.sleep(think_time)
+                continue
+            conversation_id = response.json()["conversation"]["conversation_id"]
+            for _ in range(rng.randint(shape["min_turns"], shape["max_turns"])):
+                await asyncio.sleep(min(rng.expovariate(1 / think_time), 5 * think_time) if think_time else 0)
+                started = time.perf_counter()
+                response = await client.post(
+                    f"/conversation/{conversation_id}",
+                    json={"message": rng.choice(QUESTIONS)},
+                    headers=message_headers,
+                )
+                if response.status_code == 200:
+                    stage.latencies.append(time.perf_counter() - started)
+                else:
+                    stage.error(str(response.status_code))
+                    if response.status_code == 404:
+                        break
+        except httpx.TimeoutException:
+            stage.error("timeout")
+        except httpx.TransportError as e:
+            stage.error(type(e).__name__)
+            await asyncio.sleep(1)
+
+
+async def run_stage(url, users, args, shapes):
+    stage = Stage(users)
+    limits = httpx.Limits(max_connections=users * 2, max_keepalive_connections=users * 2)
+    timeout = httpx.Timeout(TURN_DEADLINE_MS / 1000 + 5, connect=5)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=timeout) as client:
+        tasks = [
+            asyncio.create_task(virtual_user(client, index, args, shapes, stage, random.Random(args.seed + index)))
+            for index in range(users)
+        ]
+        await asyncio.sleep(args.stage_seconds)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return stage.summary(args.stage_seconds)
+
+
+def saturated(summary, baseline_p95, max_error_rate, latency_factor):
+    if summary["error_rate"] > max_error_rate or summary["p95_seconds"] is None:
+        return True
+    return baseline_p95 is not None and summary["p95_seconds"] > latency_factor * baseline_p95
+
+
+async def ramp(url, args, shapes):
+    """Runs stages with increasing users until the server saturates."""
+    stages = []
+    baseline_p95 = None
+    for users in args.users:
+        summary = await run_stage(url, users, args, shapes)
+        summary["saturated"] = saturated(summary, baseline_p95, args.max_error_rate, args.latency_factor)
+        stages.append(summary)
+        print(
+            f"   👥 {users:>4} users: {summary['turns_per_second']:>7} turns/s, "
+            f"p50 {summary['p50_seconds']}s, p95 {summary['p95_seconds']}s, "
+            f"errors {summary['error_rate']:.1%} {summary['errors'] or ''}"
+            + ("  ⚠️  saturated" if summary["saturated"] else "")
+        )
+        if baseline_p95 is None:
+            baseline_p95 = summary["p95_seconds"]
+        if summary["saturated"]:
+            break
+    sustainable = [stage for stage in stages if not stage["saturated"]]
+    best = sustainable[-1] if sustainable else None
+    return {
+        "stages": stages,
+        "max_sustainable_users": best["users"] if best else 0,
+        "max_sustainable_turns_per_second": best["turns_per_second"] if best else 0.0,
+    }
+
+
+def server_env(args, standin_path):
+    env = dict(os.environ)
+    env.update({
+        "LLM_STUB_ENABLED": "true",
+        "LLM_STUB_LATENCY_SECONDS": str(args.llm_latency),
+        "SQL_STANDIN_PATH": standin_path,
+        "USE_MCP_TOOLS": "false",
+        "RECORDING_MODE": "off",
+        "SNAPSHOT_PATH": "",
+        # Repeated synthetic questions would otherwise skip the model after the first stage
+        "PLAN_CACHE_ENABLED": "false",
+        "ANALYTICS_CACHE_TABLES": "",
+    })
+    for name in ("AZURE_OPENAI_ENDPOINT", "AZURE_OPENAI_API_KEY", "AZURE_OPENAI_DEPLOYMENT_NAME"):
+        env.setdefault(name, "stub")
+    for item in args.env:
+        name, _, value = item.partition("=")
+        env[name] = value
+    return env
+
+
+def start_server(name, args, env):
+    command = [part.format(port=args.port, threads=args.threads) for part in SERVERS[name]]
+    process = subprocess.Popen(command, cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+    url = f"http://127.0.0.1:{args.port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"❌ {name} exited with code {process.returncode}: {' '.join(command)}")
+        try:
+            if httpx.get(f"{url}/test", timeout=1).status_code == 200:
+                return process, url
+        except httpx.TransportError:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise SystemExit(f"❌ {name} did not become ready on {url}")
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find the saturation point of the backend for each serving configuration.")
+    parser.add_argument("--server", action="append", choices=sorted(SERVERS), help="Serving configuration (repeatable)")
+    parser.add_argument("--url", help="Test an already running backend instead of starting one")
+    parser.add_argument("--threads", type=int, default=16, help="Threads for gunicorn-gthread")
+    parser.add_argument("--port", type=int, default=4100)
+    parser.add_argument("--users", default="1,2,4,8,16,32,64", help="Comma-separated virtual users per stage")
+    parser.add_argument("--stage-seconds", type=float, default=30)
+    parser.add_argument("--think-time", type=float, default=2.0, help="Mean seconds between a user's messages")
+    parser.add_argument("--llm-latency", type=float, default=0.8, help="Mean seconds per stubbed model call")
+    parser.add_argument("--shapes", help="JSON file with a conversation-shape distribution")
+    parser.add_argument("--identity", choices=IDENTITIES, default="frontend", help="Identity headers the virtual users send")
+    parser.add_argument("--tenant", help="X-Tenant-Id every user sends with --identity frontend, like REACT_APP_TENANT_ID")
+    parser.add_argument("--tenants", type=int, default=4, help="Number of tenants with --identity tenants")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--latency-factor", type=float, default=3.0, help="p95 growth over the first stage that counts as saturated")
+    parser.add_argument("--env", action="append", default=[], help="Extra backend setting, e.g. SCHEDULER_MAX_CONCURRENT_TURNS=64")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Write the report as JSON")
+    args = parser.parse_args()
+    args.users = [int(users) for users in args.users.split(",")]
+    if args.tenants < 1:
+        parser.error("--tenants must be at least 1")
+
+    shapes = DEFAULT_SHAPES
+    if args.shapes:
+        with open(args.shapes, "r", encoding="utf-8") as f:
+            shapes = json.load(f)
+
+    report = {}
+    if args.url:
+        print(f"🎯 Load testing {args.url}")
+        report[args.url] = asyncio.run(ramp(args.url, args, shapes))
+    else:
+        sys.path.insert(0, BACKEND)
+        from src.loadstub import seed_standin
+
+        standin_path = os.path.join(tempfile.mkdtemp(prefix="loadtest-"), "standin.sqlite")
+        seed_standin(standin_path)
+        env = server_env(args, standin_path)
+        for name in args.server or ["flask-threaded"]:
+            print(f"🚀 Starting {name}")
+            process, url = start_server(name, args, env)
+            try:
+                report[name] = asyncio.run(ramp(url, args, shapes))
+            finally:
+                stop_server(process)
+
+    print("\n📊 Saturation summary")
+    for name, result in report.items():
+        print(
+            f"   {name}: sustains {result['max_sustainable_users']} users, "
+            f"{result['max_sustainable_turns_per_second']} turns/s"
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,102 @@
 from dotenv import load_dotenv
 load_dotenv()
 
+import asyncio
+from typing import Any, Dict, List, Optional
 from src.config import config
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import Context, FastMCP
 
 # Create an MCP server
-mcp = FastMCP("Sales Data Agent ", "1.0.0")
+mcp = FastMCP("Sales Data Agent")
 
 
-import httpx
-from mcp.server.fastmcp import FastMCP
+def _page_size(page_size: Optional[int]) -> int:
+    return max(1, min(int(page_size or config.mcp_page_size), 5000))
 
-mcp = FastMCP("My App")
+
+async def _read_page(cursor: str, page_size: int, ctx: Context) -> Dict[str, Any]:
+    from src.resultbuffer import result_buffer
+
+    # Rows arrive from a background thread; report progress while waiting so clients keep long queries alive
+    while not await asyncio.to_thread(result_buffer.wait, cursor, page_size, 1.0):
+        await ctx.report_progress(result_buffer.rows_fetched(cursor))
+    page = result_buffer.fetch(cursor, page_size)
+    if page is None:
+        return {"error": "Cursor is unknown or its result has expired; run the query again"}
+    return page
 
 
 @mcp.tool()
-def run_sql_query(query: str, params: tuple = ()) -> float:
-    """Receives a Microsoft SQL Server-compliant query and parameters and returns the result of the query"""
-    from src.sqlutils import run_sql_query
-    return run_sql_query(query, params)
+async def run_sql_query(query: str, ctx: Context, params: Optional[List[Any]] = None, page_size: Optional[int] = None) -> Dict[str, Any]:
+    """Receives a Microsoft SQL Server-compliant query and parameters and returns the first page of the result as {"rows", "next_cursor", "total_rows", "truncated"}.
+    When next_cursor is not null, more rows are available: call fetch_rows with it only if you need them."""
+    from src.sqlutils import flight_key, is_shareable, iter_sql_query
+    from src.resultbuffer import result_buffer
+
+    # The first page is returned as soon as its rows arrive; the rest keeps filling the buffer behind next_cursor.
+    # Identical read-only queries started while one is still being read share its result.
+    params = tuple(params or ())
+    key = flight_key(query, params) if is_shareable(query) else None
+    cursor = result_buffer.start(iter_sql_query(query, params, config.mcp_fetch_batch_size), key)
+    return await _read_page(cursor, _page_size(page_size), ctx)
 
 
 @mcp.tool()
-async def get_db_tables() -> str:
+async def fetch_rows(cursor: str, ctx: Context, page_size: Optional[int] = None) -> Dict[str, Any]:
+    """Returns the page of a run_sql_query result at the next_cursor it returned, with the cursor of the following page"""
+    return await _read_page(cursor, _page_size(page_size), ctx)
+
+
+@mcp.tool()
+async def get_db_tables() -> List[str]:
     """Lists the name of all tables accessible to the user in the database"""
     from src.sqlutils import get_db_tables
-    return get_db_tables()
+    return await asyncio.to_thread(get_db_tables)
+
+@mcp.tool()
+async def find_relevant_tables(question: str, k: int = 5) -> List[str]:
+    """Returns the tables most relevant to a question (matched on table/column names, descriptions and sample values), with their key columns. Prefer this over listing every table."""
+    from src.schemaindex import find_relevant_tables
+    return await asyncio.to_thread(find_relevant_tables, question, k)
 
 @mcp.tool()
-async def get_tables_columns_and_types(schema_name: str, table_name: str) -> str:
+async def get_tables_columns_and_types(schema_name: str, table_name: str) -> List[str]:
     """Lists the columns and their types for a specified table in the database"""
     from src.sqlutils import get_db_columns_and_types
-    return get_db_columns_and_types(schema_name, table_name)
+    return await asyncio.to_thread(get_db_columns_and_types, schema_name, table_name)
+
+@mcp.tool()
+async def describe_table_stats(schema_name: str, table_name: str, sample_percent: Optional[float] = None) -> dict:
+    """Returns the row count and per-column non-null count, approximate distinct count and min/max for a table, computed on the server"""
+    from src.sqlutils import describe_table_stats
+    return await asyncio.to_thread(describe_table_stats, schema_name, table_name, sample_percent)
+
+@mcp.tool()
+async def aggregate(
+    schema_name: str,
+    table_name: str,
+    measures: List[Dict[str, str]],
+    group_by: Optional[List[str]] = None,
+    filters: Optional[List[Dict[str, Any]]] = None,
+    limit: int = 100,
+) -> List[Dict[str, Any]]:
+    """Computes aggregates (COUNT, COUNT_DISTINCT, APPROX_COUNT_DISTINCT, SUM, AVG, MIN, MAX) with GROUP BY on the server and returns only the summary rows.
+    measures: items like {"function": "SUM", "column": "Amount"}; use column "*" with COUNT to count rows.
+    filters: items like {"column": "Region", "operator": "=", "value": "West"}, combined with AND."""
+    from src.sqlutils import aggregate
+    return await asyncio.to_thread(aggregate, schema_name, table_name, measures, group_by, filters, limit)
+
+@mcp.tool()
+async def sample_rows(schema_name: str, table_name: str, n: int = 10, sample_percent: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Returns a small sample of rows (at most 100) from a table"""
+    from src.sqlutils import sample_rows
+    return await asyncio.to_thread(sample_rows, schema_name, table_name, n, sample_percent)
 
 if __name__ == "__main__":
     config.log_config_status()
+    from src.schemaindex import schema_index
+    # Build the find_relevant_tables index in the background while the server starts
+    schema_index.current()
     print("🚀 Starting MCP Server...")
     mcp.run(transport='streamable-http', )
     # mcp.run(transport='stdio', )
@@ -2,13 +2,19 @@ import os
 from typing import Optional
 
 class Config:
-    """Configuration class that validates and provides access to environment variables."""
+    """Configuration class that validates and provides access to environment variables.
+
+    Validation is deferred until a required value is first read, so importing the
+    module stays cheap and does not depend on the environment being loaded yet.
+    """
     
     def __init__(self):
-        self.validate_environment()
+        self._validated = False
     
     def validate_environment(self):
         """Validates that all required environment variables are present."""
+        if self._validated:
+            return
         required_vars = [
             'AZURE_SQL_SERVER',
             'AZURE_SQL_DATABASE',
@@ -26,22 +32,27 @@ class Config:
                 f"Missing required environment variables: {', '.join(missing_vars)}\n"
                 f"Please check your .env file and ensure all required variables are set."
             )
+        self._validated = True
     
    
     @property
     def azure_sql_server(self) -> str:
+        self.validate_environment()
         return os.getenv('AZURE_SQL_SERVER')
     
     @property
     def azure_sql_database(self) -> str:
+        self.validate_environment()
         return os.getenv('AZURE_SQL_DATABASE')
     
     @property
     def azure_sql_username(self) -> str:
+        self.validate_environment()
         return os.getenv('AZURE_SQL_USERNAME')
     
     @property
     def azure_sql_password(self) -> str:
+        self.validate_environment()
         return os.getenv('AZURE_SQL_PASSWORD')
     
     @property
@@ -58,8 +69,54 @@ class Config:
             f"Connection Timeout=30;"
         )
     
+    @property
+    def sql_single_flight_enabled(self) -> bool:
+        """Share one database call between concurrent identical read-only queries."""
+        return os.getenv('SQL_SINGLE_FLIGHT_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+    @property
+    def schema_index_ttl_seconds(self) -> int:
+        """How long the find_relevant_tables index is used before it is rebuilt."""
+        return int(os.getenv('SCHEMA_INDEX_TTL_SECONDS', '3600'))
+    
+    @property
+    def schema_index_sample_values(self) -> int:
+        """Rows sampled per table to index text values; 0 disables sampling."""
+        return int(os.getenv('SCHEMA_INDEX_SAMPLE_VALUES', '3'))
+    
+    @property
+    def schema_index_embedding_model(self) -> Optional[str]:
+        """Optional local sentence-transformers model blended with BM25, e.g. all-MiniLM-L6-v2."""
+        return os.getenv('SCHEMA_INDEX_EMBEDDING_MODEL')
+    
+    @property
+    def mcp_page_size(self) -> int:
+        """Default number of rows returned per run_sql_query/fetch_rows page."""
+        return int(os.getenv('MCP_PAGE_SIZE', '500'))
+    
+    @property
+    def mcp_fetch_batch_size(self) -> int:
+        """Rows fetched from SQL Server per batch into the result buffer."""
+        return int(os.getenv('MCP_FETCH_BATCH_SIZE', '1000'))
+    
+    @property
+    def mcp_result_buffer_ttl_seconds(self) -> int:
+        """How long an unread result stays available to fetch_rows."""
+        return int(os.getenv('MCP_RESULT_BUFFER_TTL_SECONDS', '600'))
+    
+    @property
+    def mcp_result_buffer_max_results(self) -> int:
+        """Buffered results kept at once; the least recently read is evicted first."""
+        return int(os.getenv('MCP_RESULT_BUFFER_MAX_RESULTS', '32'))
+    
+    @property
+    def mcp_result_buffer_max_rows(self) -> int:
+        """Rows kept per buffered result; larger results are truncated."""
+        return int(os.getenv('MCP_RESULT_BUFFER_MAX_ROWS', '100000'))
+    
     def log_config_status(self):
         """Logs the configuration status (without sensitive data)."""
+        self.validate_environment()
         print("✅ Environment configuration loaded successfully:")
         print(f"   Azure SQL Server: {self.azure_sql_server}")
         print(f"   Azure SQL Database: {self.azure_sql_database}")
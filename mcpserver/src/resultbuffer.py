@@ -0,0 +1,174 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional
+from uuid import uuid4
+from src.config import config
+
+
+class _Result:
+    """Rows of one query, filled by a background thread while clients read pages."""
+
+    def __init__(self, max_rows: int, key: Optional[Hashable] = None):
+        self.max_rows = max_rows
+        self.key = key
+        self.rows: List[Dict[str, Any]] = []
+        self.done = False
+        self.truncated = False
+        self.error: Optional[str] = None
+        self.evicted = False
+        self.read_at = time.monotonic()
+        self._changed = threading.Condition()
+
+    def fill(self, batches: Iterator[List[Dict[str, Any]]], finished: Callable[["_Result"], None]):
+        try:
+            for batch in batches:
+                with self._changed:
+                    if self.evicted:
+                        break
+                    self.rows.extend(batch)
+                    if len(self.rows) > self.max_rows:
+                        del self.rows[self.max_rows:]
+                        self.truncated = True
+                    self._changed.notify_all()
+                if self.truncated:
+                    break
+        except Exception as e:
+            print(f"❌ SQL query failed: {e}")
+            self.error = str(e)
+        finally:
+            # Closing the generator closes the cursor and connection early on truncation or eviction
+            batches.close()
+            with self._changed:
+                self.done = True
+                self._changed.notify_all()
+            finished(self)
+
+    def wait_for(self, count: int, timeout: float) -> bool:
+        """Waits until at least count rows are available or the query finished. Returns True if so."""
+        with self._changed:
+            return self._changed.wait_for(lambda: self.done or len(self.rows) >= count, timeout)
+
+
+class ResultBuffer:
+    """
+    Server-side buffer of query results that clients read page by page with a cursor.
+
+    A query is fetched by a background thread, so the first page can be returned as soon as
+    its rows have arrived while the rest keeps streaming into the buffer. A cursor is
+    "<result id>:<offset>", so any page can be fetched again until the result is evicted.
+    Results expire after ttl_seconds without a read; when more than max_results are buffered
+    the least recently read one is evicted, which also stops its query if it is still running.
+    Starting a query that is already being read under the same key shares that result instead
+    of running the query again.
+    """
+
+    def __init__(self, ttl_seconds: int, max_results: int, max_rows: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_results = max_results
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._results: "OrderedDict[str, _Result]" = OrderedDict()
+        self._running: Dict[Hashable, str] = {}
+        self.collapsed = 0
+
+    def _evict(self, now: float):
+        expired = [key for key, result in self._results.items() if now - result.read_at > self.ttl_seconds]
+        for key in expired:
+            self._results.pop(key).evicted = True
+        while len(self._results) > self.max_results:
+            self._results.popitem(last=False)[1].evicted = True
+
+    def start(self, batches: Iterator[List[Dict[str, Any]]], key: Optional[Hashable] = None) -> str:
+        """
+        Starts reading a query's batches in the background and returns the cursor of its first page.
+        Args:
+            batches (Iterator[List[Dict[str, Any]]]): Generator of row batches, not yet started.
+            key (Optional[Hashable]): Identity of a shareable query; while a result for the same key
+                is still being read, its cursor is returned and batches is closed unread.
+        """
+        with self._lock:
+            self._evict(time.monotonic())
+            shared_id = self._running.get(key) if key is not None else None
+            shared = self._results.get(shared_id) if shared_id else None
+            if shared is not None and not shared.done:
+                self.collapsed += 1
+                shared.read_at = time.monotonic()
+                self._results.move_to_end(shared_id)
+            else:
+                shared = None
+                result_id = uuid4().hex
+                result = _Result(self.max_rows, key)
+                self._results[result_id] = result
+                if key is not None:
+                    self._running[key] = result_id
+                self._evict(time.monotonic())
+        if shared is not None:
+            batches.close()
+            return f"{shared_id}:0"
+        threading.Thread(target=result.fill, args=(batches, self._finished), name=f"result-{result_id[:8]}", daemon=True).start()
+        return f"{result_id}:0"
+
+    def _finished(self, result: _Result):
+        if result.key is None:
+            return
+        with self._lock:
+            running_id = self._running.get(result.key)
+            # A newer query may already have taken the key after this one was evicted
+            if running_id is not None and self._results.get(running_id) in (result, None):
+                del self._running[result.key]
+
+    def _parse(self, cursor: str):
+        result_id, _, offset = (cursor or "").partition(":")
+        if not offset.isdigit():
+            return None, 0
+        return self._results.get(result_id), int(offset)
+
+    def rows_fetched(self, cursor: str) -> int:
+        result, _ = self._parse(cursor)
+        return len(result.rows) if result else 0
+
+    def wait(self, cursor: str, page_size: int, timeout: float) -> bool:
+        """Blocks until the page at the cursor is complete or the query finished. Returns True if so."""
+        result, offset = self._parse(cursor)
+        return result is None or result.wait_for(offset + page_size, timeout)
+
+    def fetch(self, cursor: str, page_size: int) -> Optional[Dict[str, Any]]:
+        """
+        Returns the rows available at the cursor, up to page_size, or None if the cursor is
+        invalid or its result was evicted. Call wait() first to get a full page.
+        """
+        result_id, _, offset = (cursor or "").partition(":")
+        if not offset.isdigit():
+            return None
+        with self._lock:
+            self._evict(time.monotonic())
+            result = self._results.get(result_id)
+            if result is None:
+                return None
+            result.read_at = time.monotonic()
+            self._results.move_to_end(result_id)
+        if result.error is not None and not result.rows:
+            return {"error": result.error}
+        start = int(offset)
+        rows = result.rows[start:start + page_size]
+        end = start + len(rows)
+        more = end < len(result.rows) or not result.done
+        page = {
+            "rows": rows,
+            "next_cursor": f"{result_id}:{end}" if more else None,
+            # Unknown until the query has been read to the end
+            "total_rows": len(result.rows) if result.done else None,
+            "truncated": result.truncated,
+        }
+        if result.error is not None:
+            # The query failed after some rows were read
+            page["error"] = result.error
+        return page
+
+
+result_buffer = ResultBuffer(
+    config.mcp_result_buffer_ttl_seconds,
+    config.mcp_result_buffer_max_results,
+    config.mcp_result_buffer_max_rows,
+)
@@ -0,0 +1,262 @@
+import math
+import re
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from src.config import config
+from src.sqlutils import run_sql_query
+
+METADATA_QUERY = """
+SELECT
+    t.TABLE_SCHEMA,
+    t.TABLE_NAME,
+    c.COLUMN_NAME,
+    c.DATA_TYPE,
+    CAST(tp.value AS NVARCHAR(4000)) AS TABLE_DESCRIPTION,
+    CAST(cp.value AS NVARCHAR(4000)) AS COLUMN_DESCRIPTION
+FROM INFORMATION_SCHEMA.TABLES t
+JOIN INFORMATION_SCHEMA.COLUMNS c
+    ON c.TABLE_SCHEMA = t.TABLE_SCHEMA AND c.TABLE_NAME = t.TABLE_NAME
+LEFT JOIN sys.extended_properties tp
+    ON tp.class = 1 AND tp.minor_id = 0 AND tp.name = 'MS_Description'
+    AND tp.major_id = OBJECT_ID(QUOTENAME(t.TABLE_SCHEMA) + '.' + QUOTENAME(t.TABLE_NAME))
+LEFT JOIN sys.extended_properties cp
+    ON cp.class = 1 AND cp.name = 'MS_Description'
+    AND cp.major_id = OBJECT_ID(QUOTENAME(t.TABLE_SCHEMA) + '.' + QUOTENAME(t.TABLE_NAME))
+    AND cp.minor_id = COLUMNPROPERTY(OBJECT_ID(QUOTENAME(t.TABLE_SCHEMA) + '.' + QUOTENAME(t.TABLE_NAME)), c.COLUMN_NAME, 'ColumnId')
+WHERE t.TABLE_TYPE = 'BASE TABLE'
+ORDER BY t.TABLE_SCHEMA, t.TABLE_NAME, c.ORDINAL_POSITION
+"""
+TEXT_TYPES = {"char", "varchar", "nchar", "nvarchar"}
+# Table and column names matter more than descriptions and sample values
+NAME_WEIGHT = 3
+COLUMN_WEIGHT = 2
+MAX_COLUMNS_SHOWN = 12
+# A failed build is retried after this many seconds (or the TTL, if shorter)
+RETRY_SECONDS = 60
+
+
+def tokenize(text: str) -> List[str]:
+    """Splits identifiers and prose into lower-case terms (camelCase and snake_case aware)."""
+    text = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", str(text or ""))
+    terms = []
+    for term in re.findall(r"[A-Za-z0-9]+", text.lower()):
+        if len(term) > 3 and term.endswith("ies"):
+            term = term[:-3] + "y"
+        elif len(term) > 3 and term.endswith("s") and not term.endswith("ss"):
+            term = term[:-1]
+        terms.append(term)
+    return terms
+
+
+class _TableEntry:
+    def __init__(self, schema_name: str, table_name: str):
+        self.schema_name = schema_name
+        self.table_name = table_name
+        self.description = ""
+        self.columns: List[Tuple[str, str]] = []
+        self.column_terms: Dict[str, set] = {}
+        self.terms: Counter = Counter()
+        self.text_parts: List[str] = []
+
+    @property
+    def name(self) -> str:
+        return f"[{self.schema_name}].[{self.table_name}]"
+
+
+class _Index:
+    """One immutable build of the schema index; searches keep using it while the next one is built."""
+
+    def __init__(self, tables: List[_TableEntry], embeddings=None):
+        self.tables = tables
+        self.embeddings = embeddings
+        self.document_frequency: Counter = Counter()
+        for entry in tables:
+            self.document_frequency.update(set(entry.terms))
+        self.average_length = sum(sum(entry.terms.values()) for entry in tables) / len(tables) if tables else 0.0
+
+
+class SchemaIndex:
+    """
+    Searchable index over table names, column names, MS_Description properties and sample values.
+
+    Tables are ranked with BM25; when SCHEMA_INDEX_EMBEDDING_MODEL names a sentence-transformers
+    model and the package is installed, the BM25 score is blended with embedding similarity.
+    The index is built by a background thread on first use and rebuilt after
+    SCHEMA_INDEX_TTL_SECONDS; searches keep using the previous index while a rebuild runs, so
+    no conversation turn waits for the metadata and sampling queries.
+    """
+
+    def __init__(self, ttl_seconds: int, sample_values: int, embedding_model: Optional[str] = None):
+        self.ttl_seconds = ttl_seconds
+        self.sample_values = sample_values
+        self.embedding_model = embedding_model
+        self._lock = threading.Lock()
+        self._index: Optional[_Index] = None
+        self._building = False
+        self._next_build_at = 0.0
+        self._encoder = None
+
+    def _build(self) -> _Index:
+        started = time.perf_counter()
+        rows = run_sql_query(METADATA_QUERY)
+        if rows and "error" in rows[0]:
+            raise RuntimeError(rows[0]["error"])
+
+        tables: Dict[Tuple[str, str], _TableEntry] = {}
+        for row in rows:
+            key = (row["TABLE_SCHEMA"], row["TABLE_NAME"])
+            entry = tables.get(key)
+            if entry is None:
+                entry = tables[key] = _TableEntry(*key)
+                entry.description = row.get("TABLE_DESCRIPTION") or ""
+                entry.terms.update(tokenize(entry.schema_name) + tokenize(entry.table_name) * NAME_WEIGHT)
+                entry.terms.update(tokenize(entry.description))
+                entry.text_parts += [entry.table_name, entry.description]
+            column_name = row["COLUMN_NAME"]
+            entry.columns.append((column_name, row["DATA_TYPE"]))
+            column_terms = tokenize(column_name)
+            entry.column_terms[column_name] = set(column_terms)
+            entry.terms.update(column_terms * COLUMN_WEIGHT)
+            entry.terms.update(tokenize(row.get("COLUMN_DESCRIPTION")))
+            entry.text_parts += [column_name, row.get("COLUMN_DESCRIPTION") or ""]
+
+        if self.sample_values > 0:
+            for entry in tables.values():
+                self._add_sample_values(entry)
+
+        index = _Index(list(tables.values()), self._build_embeddings(list(tables.values())))
+        print(f"🔎 Schema index built for {len(index.tables)} tables in {time.perf_counter() - started:.1f}s")
+        return index
+
+    def _add_sample_values(self, entry: _TableEntry):
+        """Indexes a few values of each text column so questions can match on data, e.g. region names."""
+        text_columns = [name for name, data_type in entry.columns if data_type.lower() in TEXT_TYPES]
+        if not text_columns:
+            return
+        select_list = ", ".join("[" + name.replace("]", "]]") + "]" for name in text_columns)
+        query = (
+            f"SELECT TOP (?) {select_list} FROM [{entry.schema_name.replace(']', ']]')}]"
+            f".[{entry.table_name.replace(']', ']]')}]"
+        )
+        rows = run_sql_query(query, (self.sample_values,))
+        if rows and "error" in rows[0]:
+            return
+        for row in rows:
+            for name in text_columns:
+                value = row.get(name)
+                if value and len(str(value)) <= 64:
+                    entry.terms.update(tokenize(value))
+                    entry.text_parts.append(str(value))
+
+    def _build_embeddings(self, tables: List[_TableEntry]):
+        if not self.embedding_model:
+            return None
+        try:
+            if self._encoder is None:
+                from sentence_transformers import SentenceTransformer
+
+                self._encoder = SentenceTransformer(self.embedding_model)
+            documents = [" ".join(part for part in entry.text_parts if part) for entry in tables]
+            return self._encoder.encode(documents, normalize_embeddings=True)
+        except ImportError:
+            print("⚠️  sentence-transformers is not installed, schema index uses BM25 only")
+        except Exception as e:
+            print(f"⚠️  Could not build schema embeddings, using BM25 only: {e}")
+        return None
+
+    def _rebuild(self):
+        try:
+            index = self._build()
+        except Exception as e:
+            print(f"❌ Error building schema index: {e}")
+            with self._lock:
+                self._building = False
+                self._next_build_at = time.monotonic() + min(RETRY_SECONDS, self.ttl_seconds)
+            return
+        with self._lock:
+            self._index = index
+            self._building = False
+            self._next_build_at = time.monotonic() + self.ttl_seconds
+
+    def current(self) -> Optional[_Index]:
+        """Returns the latest index (None before the first build) and starts a rebuild when it is due."""
+        with self._lock:
+            if not self._building and time.monotonic() >= self._next_build_at:
+                self._building = True
+                threading.Thread(target=self._rebuild, name="schema-index-build", daemon=True).start()
+            return self._index
+
+    @staticmethod
+    def _bm25(index: _Index, entry: _TableEntry, query_terms: List[str], k1: float = 1.2, b: float = 0.75) -> float:
+        length = sum(entry.terms.values())
+        total = len(index.tables)
+        score = 0.0
+        for term in query_terms:
+            frequency = entry.terms.get(term, 0)
+            if not frequency:
+                continue
+            df = index.document_frequency[term]
+            idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+            score += idf * frequency * (k1 + 1) / (frequency + k1 * (1 - b + b * length / (index.average_length or 1)))
+        return score
+
+    def search(self, question: str, k: int = 5) -> Optional[List[Tuple[_TableEntry, float]]]:
+        """Returns the k tables most relevant to the question with their scores, or None until the first build finished."""
+        index = self.current()
+        if index is None:
+            return None
+        query_terms = tokenize(question)
+        scores = [self._bm25(index, entry, query_terms) for entry in index.tables]
+
+        if index.embeddings is not None:
+            top = max(scores) if scores and max(scores) > 0 else 1.0
+            question_embedding = self._encoder.encode([question], normalize_embeddings=True)[0]
+            similarities = index.embeddings @ question_embedding
+            scores = [0.5 * score / top + 0.5 * float(similarity) for score, similarity in zip(scores, similarities)]
+
+        ranked = sorted(zip(index.tables, scores), key=lambda item: item[1], reverse=True)
+        return [(entry, score) for entry, score in ranked[:k] if score > 0]
+
+    @staticmethod
+    def describe(entry: _TableEntry, query_terms: set) -> str:
+        """Compact one-line description, listing the columns that matched the question first."""
+        matched = [column for column in entry.columns if entry.column_terms[column[0]] & query_terms]
+        others = [column for column in entry.columns if column not in matched]
+        shown = (matched + others)[:MAX_COLUMNS_SHOWN]
+        columns = ", ".join(f"{name} {data_type}" for name, data_type in shown)
+        if len(entry.columns) > len(shown):
+            columns += f", +{len(entry.columns) - len(shown)} more"
+        description = f" - {entry.description}" if entry.description else ""
+        return f"{entry.name}{description} | columns: {columns}"
+
+
+schema_index = SchemaIndex(
+    config.schema_index_ttl_seconds,
+    config.schema_index_sample_values,
+    config.schema_index_embedding_model,
+)
+
+
+def find_relevant_tables(question: str, k: int = 5) -> List[str]:
+    """
+    Finds the tables most relevant to a question.
+    Args:
+        question (str): The user's question or a search phrase.
+        k (int): Maximum number of tables to return.
+    Returns:
+        List[str]: One compact line per table with its description and most relevant columns.
+    """
+    try:
+        k = max(1, min(int(k or 5), 20))
+        results = schema_index.search(question, k)
+        if results is None:
+            return ["The schema index is still being built; use get_db_tables and get_tables_columns_and_types for now"]
+        if not results:
+            return ["No matching tables found; use get_db_tables to list all tables"]
+        query_terms = set(tokenize(question))
+        return [schema_index.describe(entry, query_terms) for entry, _ in results]
+    except Exception as e:
+        print(f"❌ Error in find_relevant_tables: {e}")
+        return [f"Error searching tables: {str(e)}"]
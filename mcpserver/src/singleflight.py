@@ -0,0 +1,73 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Collapses concurrent identical calls into one execution whose result is shared.
+
+    The first caller for a key (the leader) runs the call; callers arriving while it is in
+    flight wait for the leader's result instead of running it again. Thread callers use do()
+    and asyncio callers use do_async(); both share the same in-flight table. Nothing is
+    cached: once the leader finishes, the next call for the key runs again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Hashable, Future] = {}
+        self.executed = 0
+        self.collapsed = 0
+
+    def _join(self, key: Hashable):
+        """Returns (future, is_leader) for the key."""
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.collapsed += 1
+                return future, False
+            future = self._in_flight[key] = Future()
+            # A running future cannot be cancelled, so no waiter can cancel it for the others
+            future.set_running_or_notify_cancel()
+            self.executed += 1
+            return future, True
+
+    def _finish(self, key: Hashable, future: Future, call: Callable[[], Any]) -> Any:
+        try:
+            result = call()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def do(self, key: Hashable, call: Callable[[], Any], wait: Callable[[Future], Any] = None) -> Any:
+        """
+        Runs call, or waits for the identical call already in flight.
+        Args:
+            key (Hashable): Identity of the call.
+            call (Callable[[], Any]): The work to run if no identical call is in flight.
+            wait (Callable[[Future], Any]): Optional custom wait for followers, e.g. one that
+                checks for cancellation; defaults to Future.result.
+        """
+        future, leader = self._join(key)
+        if leader:
+            return self._finish(key, future, call)
+        return wait(future) if wait else future.result()
+
+    async def do_async(self, key: Hashable, call: Callable[[], Any]) -> Any:
+        """Like do(), but runs the blocking call in a worker thread and awaits followers."""
+        future, leader = self._join(key)
+        if leader:
+            return await asyncio.to_thread(self._finish, key, future, call)
+        # Shielded so a cancelled follower stops waiting without cancelling the shared call
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"in_flight": len(self._in_flight), "executed": self.executed, "collapsed": self.collapsed}
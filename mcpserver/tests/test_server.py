@@ -0,0 +1,47 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("mcp")
+pytest.importorskip("dotenv")
+
+import server
+from src import sqlutils
+
+
+def call_tool(name, arguments):
+    # Goes through FastMCP's output validation, like a client call
+    return asyncio.run(server.mcp.call_tool(name, arguments))
+
+
+def test_table_tools_return_their_lists(monkeypatch):
+    monkeypatch.setattr(sqlutils, "get_db_tables", lambda: ["[Sales].[Orders]"])
+    monkeypatch.setattr(
+        sqlutils, "get_db_columns_and_types", lambda schema_name, table_name: ["Region (nvarchar)"]
+    )
+
+    _, structured = call_tool("get_db_tables", {})
+    assert structured == {"result": ["[Sales].[Orders]"]}
+    _, structured = call_tool("get_tables_columns_and_types", {"schema_name": "Sales", "table_name": "Orders"})
+    assert structured == {"result": ["Region (nvarchar)"]}
+
+
+def test_server_side_tools_do_not_block_the_event_loop(monkeypatch):
+    def slow_sample(*args):
+        time.sleep(0.3)
+        return []
+
+    monkeypatch.setattr(sqlutils, "sample_rows", slow_sample)
+
+    async def scenario():
+        tool = asyncio.create_task(
+            server.mcp.call_tool("sample_rows", {"schema_name": "Sales", "table_name": "Orders"})
+        )
+        started = asyncio.get_running_loop().time()
+        await asyncio.sleep(0.05)
+        elapsed = asyncio.get_running_loop().time() - started
+        await tool
+        return elapsed
+
+    assert asyncio.run(scenario()) < 0.2
@@ -0,0 +1,153 @@
+"""
+Deterministic performance regression test built on recorded model and SQL interactions.
+
+1. Record a session against the live services, with the same caches and shortcuts off as the replay:
+       cd backend && PLAN_CACHE_ENABLED=false SNAPSHOTS_ENABLED=false EARLY_EXIT_ENABLED=false \
+           RECORDING_MODE=record RECORDING_PATH=recording.jsonl.gz python main.py
+   then use the app (or run test.py / debug_test.py) to exercise the questions you care about.
+2. Save a baseline from the recording:
+       python perf_test.py --recording backend/recording.jsonl.gz --update-baseline
+3. Re-run after changes; the script exits non-zero when turn latency, model calls per turn,
+   SQL calls per turn or bytes allocated per turn regress past the tolerance:
+       python perf_test.py --recording backend/recording.jsonl.gz
+
+Replays never touch Azure OpenAI or Azure SQL: every call is served from the recording after
+waiting for its recorded latency times --latency-scale.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BACKEND = os.path.join(ROOT, "backend")
+DEFAULT_BASELINE = os.path.join(ROOT, "perf_baseline.json")
+CHECKED_METRICS = {
+    # metric: absolute slack so near-zero baselines do not fail on noise
+    "p50_turn_seconds": 0.005,
+    "p95_turn_seconds": 0.01,
+    "llm_calls_per_turn": 0.0,
+    "sql_calls_per_turn": 0.0,
+    "peak_bytes_per_turn": 64 * 1024,
+}
+# Caches and shortcuts answer turns from state that outlives a turn, so each run would take a
+# different path than the recording; the same settings must be used when recording
+DETERMINISTIC_SETTINGS = {
+    "PLAN_CACHE_ENABLED": "false",
+    "PLAN_CACHE_PATH": "",
+    "SNAPSHOTS_ENABLED": "false",
+    "SNAPSHOT_PATH": "",
+    "EARLY_EXIT_ENABLED": "false",
+    "ANALYTICS_CACHE_TABLES": "",
+}
+
+
+def replay(recording, latency_scale, verbose=False):
+    """Replays every recorded turn through Conversation.add_message and returns summary metrics."""
+    os.environ["RECORDING_MODE"] = "replay"
+    os.environ["RECORDING_PATH"] = recording
+    os.environ["REPLAY_LATENCY_SCALE"] = str(latency_scale)
+    os.environ.update(DETERMINISTIC_SETTINGS)
+    for name in ("AZURE_OPENAI_ENDPOINT", "AZURE_OPENAI_API_KEY", "AZURE_OPENAI_DEPLOYMENT_NAME"):
+        os.environ.setdefault(name, "replay")
+    sys.path.insert(0, BACKEND)
+
+    from src.conversation import Conversation
+    from src.recording import read_recording, recorder
+
+    turns = [entry for entry in read_recording(recording) if entry["kind"] == "turn"]
+    if not turns:
+        raise SystemExit(f"❌ {recording} contains no recorded turns")
+
+    conversations = {}
+    results = []
+    tracemalloc.start()
+    for turn in turns:
+        conversation = conversations.get(turn["conversation_id"])
+        if conversation is None:
+            conversation = conversations[turn["conversation_id"]] = Conversation(turn["conversation_id"])
+        llm_before = recorder.counters["llm_calls"]
+        sql_before = recorder.counters["sql_calls"]
+        tracemalloc.reset_peak()
+        memory_before = tracemalloc.get_traced_memory()[0]
+        output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+        started = time.perf_counter()
+        with output:
+            conversation.add_message(turn["message"])
+        elapsed = time.perf_counter() - started
+        results.append({
+            "seconds": elapsed,
+            "llm_calls": recorder.counters["llm_calls"] - llm_before,
+            "sql_calls": recorder.counters["sql_calls"] - sql_before,
+            "peak_bytes": tracemalloc.get_traced_memory()[1] - memory_before,
+        })
+    tracemalloc.stop()
+
+    seconds = sorted(result["seconds"] for result in results)
+    return {
+        "turns": len(results),
+        "latency_scale": latency_scale,
+        "p50_turn_seconds": round(statistics.median(seconds), 4),
+        "p95_turn_seconds": round(seconds[min(len(seconds) - 1, int(0.95 * len(seconds)))], 4),
+        "llm_calls_per_turn": round(statistics.mean(result["llm_calls"] for result in results), 3),
+        "sql_calls_per_turn": round(statistics.mean(result["sql_calls"] for result in results), 3),
+        "peak_bytes_per_turn": max(result["peak_bytes"] for result in results),
+    }
+
+
+def compare(summary, baseline, tolerance):
+    """Returns a list of regressions of summary against baseline."""
+    if baseline.get("latency_scale") != summary["latency_scale"]:
+        print(f"⚠️  Baseline was recorded at latency scale {baseline.get('latency_scale')}, "
+              f"this run used {summary['latency_scale']}")
+    regressions = []
+    for metric, slack in CHECKED_METRICS.items():
+        if metric not in baseline:
+            continue
+        limit = baseline[metric] * (1 + tolerance) + slack
+        status = "✅" if summary[metric] <= limit else "❌"
+        print(f"   {status} {metric}: {summary[metric]} (baseline {baseline[metric]}, limit {limit:.4g})")
+        if summary[metric] > limit:
+            regressions.append(metric)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recording and check for performance regressions.")
+    parser.add_argument("--recording", required=True, help="Recording written with RECORDING_MODE=record")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline metrics JSON file")
+    parser.add_argument("--latency-scale", type=float, default=0.1, help="Multiplier for recorded latencies")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    parser.add_argument("--update-baseline", action="store_true", help="Write this run's metrics as the baseline")
+    parser.add_argument("--verbose", action="store_true", help="Show backend logs while replaying")
+    args = parser.parse_args()
+
+    print(f"🔁 Replaying {args.recording} at latency scale {args.latency_scale}")
+    summary = replay(args.recording, args.latency_scale, args.verbose)
+    print(json.dumps(summary, indent=2))
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print(f"✅ Baseline written to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"⚠️  No baseline at {args.baseline}; run with --update-baseline first")
+        return
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(summary, baseline, args.tolerance)
+    if regressions:
+        print(f"❌ Performance regressed: {', '.join(regressions)}")
+        sys.exit(1)
+    print("✅ No performance regressions")
+
+
+if __name__ == "__main__":
+    main()